@@ -2,36 +2,75 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import DevelopmentConfig
+from app.routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
 def create_app(config_class=DevelopmentConfig):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Module media must not be reachable through the public /static/ route
+    from app.services.media import check_media_root
+    check_media_root(app)
+    
+    # File uploads are hashed and spooled to disk while they stream in
+    from app.services.uploads import UploadRequest
+    app.request_class = UploadRequest
+    
     # Initialize extensions
+    from app.database import init_database, install_engine_hooks
+    init_database(app)
     db.init_app(app)
+    install_engine_hooks(app)
+    
+    # Send read-only requests to the replica bind, if one is configured
+    from app.routing import init_read_routing
+    init_read_routing(app)
+    
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Silahkan login terlebih dahulu.'
     
+    # Optional per-request SQL instrumentation / N+1 detection
+    from app.instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+    
+    # Request latency / DB time metrics
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.student import student_bp
     from app.routes.instructor import instructor_bp
     from app.routes.admin import admin_bp
     from app.routes.main import main_bp
+    from app.routes.media import media_bp
+    from app.routes.jobs import jobs_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(student_bp)
     app.register_blueprint(instructor_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(main_bp)
+    app.register_blueprint(media_bp)
+    app.register_blueprint(jobs_bp)
+    
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
     
     # Create database tables
     with app.app_context():
         db.create_all()
+    
+    # Startup self-check: log which database tuning is actually active
+    if app.config.get('DATABASE_SELF_CHECK', True):
+        from app.database import database_self_check
+        for bind, info in database_self_check(app).items():
+            app.logger.info('Database %s: %s', bind, info)
 
     # Context processor: provide commonly used Islamic phrases
     @app.context_processor
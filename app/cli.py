@@ -0,0 +1,145 @@
+import click
+from app import db
+
+
+def register_commands(app):
+    """Attach the project's maintenance commands to ``flask``"""
+
+    @app.cli.command('rebuild-progress')
+    @click.option('--course-id', type=int, default=None, help='Only rebuild rows for this course.')
+    def rebuild_progress_command(course_id):
+        """Regenerate the course_progress table from modules, assessments and results."""
+        from app.models.progress import rebuild_progress
+
+        with db.engine.begin() as connection:
+            rows = rebuild_progress(connection, course_id=course_id)
+        click.echo(f'Rebuilt {rows} progress rows.')
+
+    @app.cli.command('create-indexes')
+    def create_indexes_command():
+        """Create the model indexes an existing database is missing (create_all only adds tables)."""
+        created = []
+        with db.engine.begin() as connection:
+            inspector = db.inspect(connection)
+            for table in db.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                if connection.dialect.name == 'sqlite':
+                    # SQLite's reflection leaves out expression indexes
+                    existing = set(connection.execute(db.text(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"
+                    ), {'table': table.name}).scalars())
+                else:
+                    existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in sorted(table.indexes, key=lambda index: index.name):
+                    if index.name not in existing:
+                        index.create(connection)
+                        created.append(index.name)
+        for name in created:
+            click.echo(f'Created {name}')
+        click.echo(f'Created {len(created)} indexes.')
+
+    @app.cli.command('import-users')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--workers', type=int, default=None, help='Password hashing processes (default: CPU count).')
+    def import_users_command(path, workers):
+        """Create user accounts from a CSV/XLSX file (username, email, full_name, password, role)."""
+        from app.services.provisioning import provision_users
+        from app.services.spreadsheets import SpreadsheetError, read_rows
+        from app.services.stats import invalidate_admin_stats
+
+        workers = workers or app.config.get('PASSWORD_HASH_WORKERS')
+        try:
+            with open(path, 'rb') as f, db.engine.begin() as connection:
+                report = provision_users(connection, read_rows(f, path), workers=workers)
+        except SpreadsheetError as e:
+            raise click.ClickException(str(e))
+        invalidate_admin_stats()
+        for error in report.errors:
+            click.echo(f'Row {error["row"]} ({error["value"]}): {error["message"]}', err=True)
+        click.echo(f'Created {report.created} users, {len(report.errors)} rows rejected.')
+
+    @app.cli.command('worker')
+    @click.option('-n', '--processes', type=int, default=1, help='Number of worker processes.')
+    @click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+    def worker_command(processes, burst):
+        """Run background jobs from the jobs table."""
+        from app.jobs import run_workers
+
+        click.echo(f'Starting {processes} worker process(es).')
+        run_workers(app, count=processes, burst=burst)
+
+    @app.cli.command('seed')
+    @click.option('--scale', type=click.Choice(['small', 'medium', 'large']), default='small',
+                  help='Preset volume: small (1k users), medium (100k), large (1M users, 50M results).')
+    @click.option('--users', type=int, default=None, help='Override the number of users.')
+    @click.option('--courses', type=int, default=None, help='Override the number of courses.')
+    @click.option('--results', type=int, default=None, help='Override the (approximate) number of results.')
+    @click.option('--instructor-ratio', type=float, default=0.01, show_default=True)
+    @click.option('--modules-per-course', type=float, default=None, help='Mean modules per course.')
+    @click.option('--enrollments-per-user', type=float, default=None, help='Mean courses per student.')
+    @click.option('--popularity-skew', type=float, default=1.1, show_default=True,
+                  help='Zipf exponent of course popularity (0 = uniform).')
+    @click.option('--seed', type=int, default=42, show_default=True, help='Random seed; same seed, same data.')
+    @click.option('--batch-size', type=int, default=10_000, show_default=True, help='Rows per INSERT batch.')
+    def seed_command(scale, users, courses, results, seed, batch_size, **distribution):
+        """Fill the database with synthetic users, courses, enrollments and results."""
+        from app.services.seeding import SCALES, SEED_PASSWORD, seed_database
+
+        volume = SCALES[scale]
+        for name, value in list(distribution.items()):
+            if value is None:
+                distribution[name] = volume[name]
+        counts = seed_database(
+            db.engine,
+            users=users or volume['users'],
+            courses=courses or volume['courses'],
+            results=results if results is not None else volume['results'],
+            seed=seed,
+            batch_size=batch_size,
+            echo=click.echo,
+            **distribution
+        )
+        for table, count in counts.items():
+            click.echo(f'{table}: {count} rows')
+        click.echo(f"Users are named seed<id>; every password is '{SEED_PASSWORD}'.")
+
+    @app.cli.command('db-check')
+    def db_check_command():
+        """Show the backend, pragmas and pool settings in effect for each engine."""
+        from app.database import database_self_check
+
+        for bind, info in database_self_check(app).items():
+            click.echo(f'[{bind}]')
+            for key, value in info.items():
+                click.echo(f'  {key}: {value}')
+
+    @app.cli.command('rebuild-search')
+    def rebuild_search_command():
+        """Re-index every course and module for full-text search."""
+        from app.services.search import rebuild_search_index, search_available
+
+        with db.engine.begin() as connection:
+            if not search_available(connection):
+                raise click.ClickException('Full-text search needs SQLite FTS5.')
+            entries = rebuild_search_index(connection)
+        click.echo(f'Indexed {entries} courses and modules.')
+
+    @app.cli.command('sync-replica')
+    def sync_replica_command():
+        """Copy the primary SQLite database onto the SQLite replica."""
+        replica = db.engines.get('replica')
+        if replica is None:
+            raise click.ClickException('No replica configured (set REPLICA_DATABASE_URL).')
+        if db.engine.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+            raise click.ClickException('sync-replica only copies SQLite files; server replicas sync themselves.')
+
+        # sqlite3's online backup API gives a consistent copy while the app runs
+        source = db.engine.raw_connection()
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        click.echo(f'Copied {db.engine.url.database} to {replica.url.database}.')
@@ -0,0 +1,92 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app import db
+
+
+def normalize_database_uri(uri):
+    """Pin MySQL URLs to the PyMySQL driver shipped in requirements.txt"""
+    if uri.startswith('mysql://'):
+        return 'mysql+pymysql://' + uri[len('mysql://'):]
+    return uri
+
+
+def backend_name(uri):
+    return make_url(uri).get_backend_name()
+
+
+def engine_options_for(uri, config):
+    """Default SQLAlchemy engine options for a database URI's backend"""
+    backend = backend_name(uri)
+    if backend == 'mysql':
+        return {
+            'pool_size': config.get('DB_POOL_SIZE', 10),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': True,
+            'connect_args': {'charset': 'utf8mb4'}
+        }
+    return {}
+
+
+def _sqlite_pragma_listener(pragmas):
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return set_sqlite_pragmas
+
+
+def init_database(app):
+    """Apply backend-specific engine options; call before ``db.init_app``"""
+    uri = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS in the config win over our defaults
+    options = engine_options_for(uri, app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    # Read replica bind (see app/routing.py); binds don't inherit the
+    # default engine options, so give it its own
+    replica_uri = app.config.get('REPLICA_DATABASE_URI')
+    if replica_uri:
+        replica_uri = normalize_database_uri(replica_uri)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds['replica'] = {'url': replica_uri, **engine_options_for(replica_uri, app.config)}
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_engine_hooks(app):
+    """Register per-connection tuning on every engine; call after ``db.init_app``"""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and pragmas:
+                event.listen(engine, 'connect', _sqlite_pragma_listener(pragmas))
+
+
+def database_self_check(app):
+    """Report which tuning is active on each engine (read back from the server)"""
+    report = {}
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            name = bind_key or 'default'
+            info = {'backend': engine.dialect.name, 'url': engine.url.render_as_string(hide_password=True)}
+            with engine.connect() as connection:
+                if engine.dialect.name == 'sqlite':
+                    for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+                        info[pragma] = connection.exec_driver_sql(f'PRAGMA {pragma}').scalar()
+                elif engine.dialect.name == 'mysql':
+                    info['server_version'] = connection.exec_driver_sql('SELECT VERSION()').scalar()
+            pool = engine.pool
+            info['pool'] = type(pool).__name__
+            if hasattr(pool, 'size'):
+                info['pool_size'] = pool.size()
+            info['pool_pre_ping'] = bool(getattr(pool, '_pre_ping', False))
+            info['pool_recycle'] = getattr(pool, '_recycle', -1)
+            report[name] = info
+    return report
@@ -0,0 +1,139 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_listeners_installed = False
+
+_WHITESPACE = re.compile(r'\s+')
+_PARAM_LIST = re.compile(r'\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+class NPlusOneError(RuntimeError):
+    """Raised in tests when one statement shape repeats too often in a request"""
+
+
+class SQLStats:
+    """Query counters for a single request"""
+
+    def __init__(self, slow_threshold=None, fingerprints=True):
+        self.count = 0
+        self.total_time = 0.0
+        # None when only metrics are on: shaping every statement is not free
+        self.fingerprints = Counter() if fingerprints else None
+        self.slow_threshold = slow_threshold
+        self.slow_queries = []
+        self.batched = False
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        if self.fingerprints is not None:
+            self.fingerprints[fingerprint(statement)] += 1
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self.slow_queries.append((statement, elapsed))
+
+    def repeated(self, threshold):
+        """Statement shapes that ran more than ``threshold`` times"""
+        if self.fingerprints is None:
+            return []
+        return [(shape, n) for shape, n in self.fingerprints.most_common() if n > threshold]
+
+
+def fingerprint(statement):
+    """Reduce a SQL statement to its shape so N+1 loops collapse to one key"""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PARAM_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def get_request_sql_stats():
+    """Return the SQLStats for the current request, or None outside one"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+
+def allow_batched_queries():
+    """Exempt the current request from N+1 detection.
+
+    For bulk operations that deliberately run one statement per chunk.
+    """
+    stats = get_request_sql_stats()
+    if stats is not None:
+        stats.batched = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if get_request_sql_stats() is not None:
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = get_request_sql_stats()
+    if stats is None:
+        return
+    starts = conn.info.get('_query_start')
+    if not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    # Listen on the Engine class so every bind (primary, replica) is covered
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _listeners_installed = True
+
+
+def _start_request():
+    slow_ms = current_app.config.get('SQL_SLOW_QUERY_MS')
+    g._sql_stats = SQLStats(slow_threshold=slow_ms / 1000 if slow_ms is not None else None,
+                            fingerprints=bool(current_app.config.get('SQL_INSTRUMENTATION')))
+
+
+def _finish_request(response):
+    stats = g.get('_sql_stats')
+    if stats is None:
+        return response
+
+    config = current_app.config
+    threshold = config.get('SQL_NPLUSONE_THRESHOLD', 10)
+    repeated = [] if stats.batched else stats.repeated(threshold)
+    if repeated:
+        shape, times = repeated[0]
+        message = f'Possible N+1: statement ran {times}x in one request: {shape[:200]}'
+        if config.get('SQL_NPLUSONE_RAISE'):
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+    if config.get('SQL_INSTRUMENTATION_HEADERS'):
+        db_ms = stats.total_time * 1000
+        response.headers['X-DB-Queries'] = str(stats.count)
+        response.headers['X-DB-Time'] = f'{db_ms:.2f}ms'
+        response.headers['Server-Timing'] = f'db;dur={db_ms:.2f};desc="{stats.count} queries"'
+    return response
+
+
+def init_sql_instrumentation(app):
+    """Record per-request query count, DB time and repeated statement shapes"""
+    # Metrics need per-request DB time, so they switch the hooks on as well;
+    # N+1 detection still only runs when SQL_INSTRUMENTATION is set
+    if not (app.config.get('SQL_INSTRUMENTATION') or app.config.get('METRICS_ENABLED')):
+        return
+
+    _install_listeners()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,217 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from app import db
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+MAX_ERROR_BACKOFF = 30  # seconds between retries while the database is unavailable
+_jobs = Job.__table__
+
+
+def job(kind):
+    """Register a function as the handler for ``kind`` jobs.
+
+    The handler is called with the Job row inside an app context; whatever
+    JSON-serializable value it returns is stored as the job's result, and
+    an exception schedules a retry.
+    """
+    def decorator(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return decorator
+
+
+def enqueue(kind, payload=None, user_id=None, delay=0, max_attempts=None):
+    """Add a job to the session; it becomes visible to workers on commit"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        user_id=user_id,
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 3),
+        available_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+
+def retry_delay(attempts, config):
+    """Exponential backoff with jitter, capped at JOB_RETRY_MAX_DELAY"""
+    base = config.get('JOB_RETRY_BACKOFF', 10)
+    delay = min(base * 2 ** (attempts - 1), config.get('JOB_RETRY_MAX_DELAY', 3600))
+    return delay * random.uniform(0.9, 1.1)
+
+
+class Worker:
+    """Claims and runs jobs one at a time until ``stop`` is called"""
+
+    def __init__(self, app, name=None):
+        self.app = app
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.timeout = app.config.get('JOB_VISIBILITY_TIMEOUT', 300)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self._stopping = threading.Event()
+
+    def stop(self, *args):
+        self._stopping.set()
+
+    def claim(self, connection):
+        """Lease the next due job to this worker; returns its id or None.
+
+        A running job whose lease ran out on its final attempt is failed
+        first. Where the backend can, the claim is one ``UPDATE ... WHERE
+        id = (SELECT ...) RETURNING id`` statement, so SQLite takes its write
+        lock up front instead of upgrading a read snapshot; MySQL cannot
+        update from a subquery on the same table, so there it is a
+        conditional UPDATE that only one racing worker can win.
+        """
+        now = datetime.utcnow()
+        due = db.and_(_jobs.c.status.in_(('queued', 'running')), _jobs.c.available_at <= now)
+        # Its last worker died or overran the lease on the final attempt
+        connection.execute(_jobs.update().where(
+            _jobs.c.status == 'running', _jobs.c.available_at <= now,
+            _jobs.c.attempts >= _jobs.c.max_attempts
+        ).values(status='failed', error='Melebihi batas waktu pengerjaan.', locked_by=None, finished_at=now))
+
+        lease = {'status': 'running', 'attempts': _jobs.c.attempts + 1, 'locked_by': self.name,
+                 'available_at': now + timedelta(seconds=self.timeout)}
+        next_due = db.select(_jobs.c.id).where(due).order_by(_jobs.c.available_at, _jobs.c.id).limit(1)
+
+        if connection.dialect.update_returning and connection.dialect.name != 'mysql':
+            return connection.execute(
+                _jobs.update().where(_jobs.c.id == next_due.scalar_subquery(), due)
+                .values(**lease).returning(_jobs.c.id)
+            ).scalar()
+
+        while True:
+            candidate = connection.execute(next_due.add_columns(_jobs.c.status, _jobs.c.attempts)).first()
+            if candidate is None:
+                return None
+            claimed = connection.execute(_jobs.update().where(
+                _jobs.c.id == candidate.id,
+                _jobs.c.status == candidate.status,
+                _jobs.c.attempts == candidate.attempts
+            ).values(**lease))
+            if claimed.rowcount == 1:
+                return candidate.id
+
+    def _finish(self, job_id, **values):
+        # Only if we still hold the lease; otherwise another worker owns it now
+        with db.engine.begin() as connection:
+            connection.execute(_jobs.update().where(
+                _jobs.c.id == job_id, _jobs.c.locked_by == self.name, _jobs.c.status == 'running'
+            ).values(locked_by=None, **values))
+
+    def _heartbeat(self, engine, job_id, done):
+        # Keep extending the lease while a long job is still running
+        while not done.wait(self.timeout / 3):
+            try:
+                with engine.begin() as connection:
+                    connection.execute(_jobs.update().where(
+                        _jobs.c.id == job_id, _jobs.c.locked_by == self.name
+                    ).values(available_at=datetime.utcnow() + timedelta(seconds=self.timeout)))
+            except Exception:
+                # Try again next tick; a third of the lease is still left
+                logger.exception('Could not extend the lease on job %s', job_id)
+
+    def run_job(self, job_id):
+        job = db.session.get(Job, job_id)
+        if job is None:
+            # Deleted between the claim and now
+            db.session.remove()
+            return
+        handler = JOB_HANDLERS.get(job.kind)
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(db.engine, job_id, done), daemon=True)
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise LookupError(f'No handler for job kind {job.kind!r}')
+            result = handler(job)
+            db.session.commit()
+        except Exception as e:
+            logger.exception('Job %s (%s) failed on attempt %s', job.id, job.kind, job.attempts)
+            db.session.rollback()
+            now = datetime.utcnow()
+            if job.attempts < job.max_attempts:
+                delay = retry_delay(job.attempts, self.app.config)
+                self._finish(job_id, status='queued', error=str(e),
+                             available_at=now + timedelta(seconds=delay))
+            else:
+                self._finish(job_id, status='failed', error=str(e), finished_at=now)
+        else:
+            self._finish(job_id, status='done', error=None, finished_at=datetime.utcnow(),
+                         result=json.dumps(result) if result is not None else None)
+        finally:
+            done.set()
+            heartbeat.join()
+            db.session.remove()
+
+    def work(self, burst=False):
+        """Run jobs until stopped; with ``burst``, until the queue is empty"""
+        failures = 0
+        with self.app.app_context():
+            while not self._stopping.is_set():
+                try:
+                    with db.engine.begin() as connection:
+                        job_id = self.claim(connection)
+                    if job_id is not None:
+                        self.run_job(job_id)
+                except Exception:
+                    # Locked database, dropped connection...: back off and retry
+                    failures += 1
+                    logger.exception('Worker %s failed to claim or finish a job', self.name)
+                    db.session.remove()
+                    self._stopping.wait(min(self.poll_interval * 2 ** failures, MAX_ERROR_BACKOFF))
+                    continue
+                failures = 0
+                if job_id is None:
+                    if burst:
+                        break
+                    self._stopping.wait(self.poll_interval)
+
+
+def _worker_process(app, burst):
+    # Forked children must not reuse the parent's pooled connections
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    worker = Worker(app)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.work(burst=burst)
+
+
+def run_workers(app, count=1, burst=False):
+    """Run ``count`` worker processes until SIGINT/SIGTERM; each finishes its current job first"""
+    if count <= 1:
+        _worker_process(app, burst)
+        return
+
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_worker_process, args=(app, burst), name=f'worker-{n}')
+                 for n in range(count)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
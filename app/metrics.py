@@ -0,0 +1,367 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' snapshots are simply left in place
+    fcntl = None
+
+from flask import current_app, g, request
+
+from app.instrumentation import get_request_sql_stats
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_SAMPLES = 20
+COUNTER_KEYS = ('count', 'sum', 'db_time', 'db_queries')
+RETIRED_SNAPSHOT = 'retired.json'
+
+
+class MetricsRegistry:
+    """In-process request metrics for one worker.
+
+    Updates are plain counter increments under a lock. When ``METRICS_DIR``
+    is configured each worker periodically writes its snapshot there so any
+    worker can serve totals for the whole gunicorn process group.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.in_flight = 0
+        self.slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)
+        self.started_at = time.time()
+        self._last_flush = 0.0
+        self._instance = None
+
+    def _endpoint(self, name):
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = {
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+                'count': 0,
+                'sum': 0.0,
+                'db_time': 0.0,
+                'db_queries': 0,
+                'status': {}
+            }
+        return stats
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, endpoint, status, elapsed, sql_stats=None):
+        status_class = f'{status // 100}xx'
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._endpoint(endpoint)
+            stats['count'] += 1
+            stats['sum'] += elapsed
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats['buckets'][index] += 1
+                    break
+            else:
+                stats['buckets'][-1] += 1
+            stats['status'][status_class] = stats['status'].get(status_class, 0) + 1
+            if sql_stats is not None:
+                stats['db_time'] += sql_stats.total_time
+                stats['db_queries'] += sql_stats.count
+                for statement, duration in sql_stats.slow_queries:
+                    self.slow_queries.append({
+                        'endpoint': endpoint,
+                        'statement': statement[:500],
+                        'duration_ms': round(duration * 1000, 2),
+                        'at': time.time()
+                    })
+
+    def instance_id(self):
+        """Unique per process, so a reused PID never overwrites an exited worker's snapshot"""
+        pid = os.getpid()
+        if self._instance is None or self._instance[0] != pid:
+            # Forked workers inherit the registry; each gets its own id
+            self._instance = (pid, f'{pid}-{uuid.uuid4().hex[:8]}')
+        return self._instance[1]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'id': self.instance_id(),
+                'pid': os.getpid(),
+                'written_at': time.time(),
+                'started_at': self.started_at,
+                'in_flight': self.in_flight,
+                'endpoints': json.loads(json.dumps(self.endpoints)),
+                'slow_queries': list(self.slow_queries)
+            }
+
+    def maybe_flush(self, directory, interval):
+        """Write this worker's snapshot to ``directory`` at most every ``interval`` seconds"""
+        now = time.monotonic()
+        if now - self._last_flush < interval:
+            return
+        self._last_flush = now
+        write_snapshot(directory, self.snapshot())
+
+
+registry = MetricsRegistry()
+
+
+def _write_json(directory, name, data):
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def write_snapshot(directory, snapshot):
+    _write_json(directory, f'worker-{snapshot["id"]}.json', snapshot)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _add_counters(target, snapshot):
+    """Add a snapshot's per-endpoint counters and slow queries into ``target``"""
+    for name, stats in snapshot['endpoints'].items():
+        merged = target['endpoints'].setdefault(name, {
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            'count': 0, 'sum': 0.0, 'db_time': 0.0, 'db_queries': 0, 'status': {}
+        })
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], stats['buckets'])]
+        for key in COUNTER_KEYS:
+            merged[key] += stats[key]
+        for status, n in stats['status'].items():
+            merged['status'][status] = merged['status'].get(status, 0) + n
+    target['slow_queries'].extend(snapshot.get('slow_queries', ()))
+    target['slow_queries'].sort(key=lambda q: q['duration_ms'], reverse=True)
+    del target['slow_queries'][SLOW_QUERY_SAMPLES:]
+
+
+def _retire(directory, paths):
+    """Fold exited workers' counters into retired.json, then delete their snapshots.
+
+    Counters must never go down (Prometheus would read a reset), so the
+    totals move into retired.json instead of vanishing. The folded ids are
+    recorded there as well: a snapshot left behind by a crash between the
+    two steps is recognised and not counted twice.
+    """
+    path = os.path.join(directory, RETIRED_SNAPSHOT)
+    with open(os.path.join(directory, 'retired.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = _read_json(path) or {'endpoints': {}, 'slow_queries': [], 'ids': []}
+        folded = set(retired['ids'])
+        for snapshot_path in paths:
+            snapshot = _read_json(snapshot_path)
+            if snapshot is not None and snapshot['id'] not in folded:
+                _add_counters(retired, snapshot)
+                folded.add(snapshot['id'])
+        # Only ids whose snapshot may still be on disk need remembering
+        retired['ids'] = sorted(folded & {_snapshot_id(p) for p in paths})
+        _write_json(directory, RETIRED_SNAPSHOT, retired)
+        for snapshot_path in paths:
+            if os.path.exists(snapshot_path):
+                os.unlink(snapshot_path)
+    return retired
+
+
+def _snapshot_id(path):
+    return os.path.basename(path)[len('worker-'):-len('.json')]
+
+
+def _load_snapshots(directory, max_age=None):
+    """``(current, retired)``: the snapshots of live workers, and exited workers' totals.
+
+    A snapshot is current while its PID is alive and it is the newest one
+    written under that PID; anything else belongs to an exited worker and
+    is retired. Left-over temp files older than ``max_age`` are deleted.
+    """
+    own = registry.snapshot()
+    current, retired = [own], None
+    if not directory or not os.path.isdir(directory):
+        return current, retired
+
+    now = time.time()
+    newest, exited = {}, []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith('.tmp'):
+            try:
+                if max_age and now - os.stat(path).st_mtime > max_age:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+            continue
+        if not (name.startswith('worker-') and name.endswith('.json')):
+            continue
+        snapshot = _read_json(path)
+        if snapshot is None:
+            continue
+        snapshot.setdefault('id', _snapshot_id(path))
+        if snapshot['id'] == own['id']:
+            continue
+        pid = snapshot['pid']
+        if pid == own['pid'] or not _pid_alive(pid):
+            exited.append(path)
+            continue
+        other = newest.get(pid)
+        if other is None or snapshot['written_at'] > other[1]['written_at']:
+            if other is not None:
+                exited.append(other[0])
+            newest[pid] = (path, snapshot)
+        else:
+            exited.append(path)
+
+    retired_path = os.path.join(directory, RETIRED_SNAPSHOT)
+    if exited and fcntl is not None:
+        retired = _retire(directory, exited)
+    else:
+        retired = _read_json(retired_path)
+        if fcntl is None:
+            current.extend(s for s in map(_read_json, exited) if s is not None)
+    skip = set(retired['ids']) if retired else set()
+    current.extend(snapshot for _, snapshot in newest.values() if snapshot['id'] not in skip)
+    return current, retired
+
+
+def collect(directory=None, max_age=None):
+    """Merge the snapshots of every worker into one view.
+
+    Counters include exited workers (through retired.json), so they only
+    ever grow. Gauges come from live workers whose snapshot is less than
+    ``max_age`` seconds old.
+    """
+    merged = {'endpoints': {}, 'in_flight': 0, 'slow_queries': [], 'workers': 0}
+    current, retired = _load_snapshots(directory, max_age)
+    now = time.time()
+    for snapshot in current:
+        if not max_age or now - snapshot['written_at'] <= max_age:
+            merged['workers'] += 1
+            merged['in_flight'] += snapshot['in_flight']
+        _add_counters(merged, snapshot)
+    if retired:
+        _add_counters(merged, retired)
+
+    for stats in merged['endpoints'].values():
+        stats['p50'] = estimate_quantile(stats['buckets'], 0.5)
+        stats['p95'] = estimate_quantile(stats['buckets'], 0.95)
+        stats['avg'] = stats['sum'] / stats['count'] if stats['count'] else 0.0
+    return merged
+
+
+def estimate_quantile(buckets, q):
+    """Upper bucket bound containing the q-quantile (None above the last bound)"""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS + (None,), buckets):
+        seen += n
+        if seen >= rank:
+            return bound
+    return None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(merged):
+    """Render merged metrics in the Prometheus text exposition format"""
+    lines = [
+        '# HELP elearning_request_duration_seconds Request latency per endpoint.',
+        '# TYPE elearning_request_duration_seconds histogram'
+    ]
+    for name, stats in sorted(merged['endpoints'].items()):
+        label = f'endpoint="{_escape(name)}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, stats['buckets']):
+            cumulative += n
+            lines.append(f'elearning_request_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'elearning_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+        lines.append(f'elearning_request_duration_seconds_sum{{{label}}} {stats["sum"]:.6f}')
+        lines.append(f'elearning_request_duration_seconds_count{{{label}}} {stats["count"]}')
+
+    lines += ['# HELP elearning_requests_total Requests per endpoint and status class.',
+              '# TYPE elearning_requests_total counter']
+    for name, stats in sorted(merged['endpoints'].items()):
+        for status, n in sorted(stats['status'].items()):
+            lines.append(f'elearning_requests_total{{endpoint="{_escape(name)}",status="{status}"}} {n}')
+
+    lines += ['# HELP elearning_db_time_seconds_total Time spent in SQL per endpoint.',
+              '# TYPE elearning_db_time_seconds_total counter']
+    for name, stats in sorted(merged['endpoints'].items()):
+        lines.append(f'elearning_db_time_seconds_total{{endpoint="{_escape(name)}"}} {stats["db_time"]:.6f}')
+
+    lines += ['# HELP elearning_db_queries_total SQL statements per endpoint.',
+              '# TYPE elearning_db_queries_total counter']
+    for name, stats in sorted(merged['endpoints'].items()):
+        lines.append(f'elearning_db_queries_total{{endpoint="{_escape(name)}"}} {stats["db_queries"]}')
+
+    lines += ['# HELP elearning_requests_in_flight Requests currently being handled.',
+              '# TYPE elearning_requests_in_flight gauge',
+              f'elearning_requests_in_flight {merged["in_flight"]}',
+              '# HELP elearning_workers Live workers reporting metrics.',
+              '# TYPE elearning_workers gauge',
+              f'elearning_workers {merged["workers"]}']
+    return '\n'.join(lines) + '\n'
+
+
+def _start_timer():
+    g._metrics_start = time.perf_counter()
+    registry.request_started()
+
+
+def _record_status(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _stop_timer(exc):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return
+    status = 500 if exc is not None else g.get('_metrics_status', 500)
+    registry.request_finished(
+        request.endpoint or 'unmatched',
+        status,
+        time.perf_counter() - start,
+        get_request_sql_stats()
+    )
+
+    directory = current_app.config.get('METRICS_DIR')
+    if directory:
+        registry.maybe_flush(directory, current_app.config.get('METRICS_FLUSH_INTERVAL', 5))
+
+
+def init_metrics(app):
+    """Collect latency, in-flight and DB-time metrics for every request"""
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    app.before_request(_start_timer)
+    app.after_request(_record_status)
+    app.teardown_request(_stop_timer)
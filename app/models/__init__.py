@@ -3,5 +3,7 @@ from .course import Course, Enrollment
 from .module import Module
 from .assessment import Assessment
 from .result import Result
+from .progress import CourseProgress
+from .job import Job
 
-__all__ = ['User', 'Course', 'Enrollment', 'Module', 'Assessment', 'Result']
+__all__ = ['User', 'Course', 'Enrollment', 'Module', 'Assessment', 'Result', 'CourseProgress', 'Job']
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from app.models.module import Module
 
 class Course(db.Model):
     __tablename__ = 'courses'
@@ -7,7 +8,7 @@ class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    instructor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    instructor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='draft', nullable=False)  # draft, published, archived
     image_url = db.Column(db.String(255))
     category = db.Column(db.String(100))
@@ -16,6 +17,11 @@ class Course(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     
+    # Catalog filter (status, category, level), newest first for keyset pages
+    __table_args__ = (
+        db.Index('idx_course_catalog', 'status', 'category', 'level', 'id'),
+    )
+    
     # Relationships
     modules = db.relationship('Module', backref='course', lazy=True, cascade='all, delete-orphan')
     assessments = db.relationship('Assessment', backref='course', lazy=True, cascade='all, delete-orphan')
@@ -28,27 +34,20 @@ class Course(db.Model):
         return self.status == 'published'
     
     def get_progress(self, user_id):
-        """Calculate course progress for a user"""
-        # Get enrollment
-        enrollment = self.enrollments
-        user_enrollment = None
-        for e in enrollment:
-            if e.user_id == user_id:
-                user_enrollment = e
-                break
-        
-        if not user_enrollment:
-            return 0
+        """Return a user's progress percentage for this course"""
+        # Indexed lookup through the uq_user_course constraint
+        progress = db.session.query(Enrollment.progress_percentage).filter_by(
+            user_id=user_id, course_id=self.id
+        ).scalar()
         
-        # Return the progress_percentage from enrollment
-        return user_enrollment.progress_percentage if user_enrollment.progress_percentage else 0
+        return progress or 0
 
 class Enrollment(db.Model):
     __tablename__ = 'enrollments'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
     enrolled_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     progress_percentage = db.Column(db.Float, default=0.0)
@@ -58,3 +57,20 @@ class Enrollment(db.Model):
     
     def __repr__(self):
         return f'<Enrollment user_id={self.user_id} course_id={self.course_id}>'
+
+# Deferred COUNT columns; views opt in with undefer() instead of loading
+# whole collections just to take their length
+Course.enrollment_count = db.column_property(
+    db.select(db.func.count(Enrollment.id))
+    .where(Enrollment.course_id == Course.id)
+    .correlate_except(Enrollment)
+    .scalar_subquery(),
+    deferred=True
+)
+Course.module_count = db.column_property(
+    db.select(db.func.count(Module.id))
+    .where(Module.course_id == Course.id)
+    .correlate_except(Module)
+    .scalar_subquery(),
+    deferred=True
+)
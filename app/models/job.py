@@ -0,0 +1,56 @@
+import json
+
+from app import db
+from datetime import datetime
+
+class Job(db.Model):
+    """A unit of background work, claimed and run by ``flask worker``.
+
+    ``available_at`` is when the job may next be claimed: for a queued job
+    its scheduled (or retry) time, for a running job the end of the
+    worker's lease. A worker that dies mid-job simply lets the lease run
+    out, and the job is picked up again.
+    """
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)  # JSON arguments for the handler
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(100))
+    result = db.Column(db.Text)  # JSON returned by the handler
+    error = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    # Claim query: status IN ('queued', 'running') AND available_at <= now
+    __table_args__ = (
+        db.Index('idx_job_claim', 'status', 'available_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+    @property
+    def args(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
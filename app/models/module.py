@@ -1,11 +1,12 @@
 from app import db
 from datetime import datetime
+from app.models.assessment import Assessment
 
 class Module(db.Model):
     __tablename__ = 'modules'
     
     id = db.Column(db.Integer, primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     content = db.Column(db.Text)  # Main course content/material
@@ -25,3 +26,12 @@ class Module(db.Model):
     
     def is_published(self):
         return self.status == 'published'
+
+# Deferred COUNT column, see Course.enrollment_count
+Module.assessment_count = db.column_property(
+    db.select(db.func.count(Assessment.id))
+    .where(Assessment.module_id == Module.id)
+    .correlate_except(Assessment)
+    .scalar_subquery(),
+    deferred=True
+)
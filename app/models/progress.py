@@ -0,0 +1,298 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.orm import Session, object_session
+from app.models.course import Enrollment
+from app.models.module import Module
+from app.models.assessment import Assessment
+from app.models.result import Result
+
+class CourseProgress(db.Model):
+    """Materialized per-(user, course) progress counters.
+
+    Only published modules and assessments count. Rows are kept in step
+    with modules, assessments, enrollments and results by the events below,
+    and can be regenerated with ``flask rebuild-progress``.
+    ``graded_assessments`` drives ``Enrollment.progress_percentage``.
+    """
+    __tablename__ = 'course_progress'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True, index=True)
+    total_modules = db.Column(db.Integer, default=0, nullable=False)
+    total_assessments = db.Column(db.Integer, default=0, nullable=False)
+    completed_assessments = db.Column(db.Integer, default=0, nullable=False)
+    graded_assessments = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CourseProgress user_id={self.user_id} course_id={self.course_id}>'
+
+
+progress_table = CourseProgress.__table__
+modules_table = Module.__table__
+assessments_table = Assessment.__table__
+results_table = Result.__table__
+enrollments_table = Enrollment.__table__
+
+# Keys per UPDATE ... WHERE (user_id, course_id) IN (...)
+REFRESH_BATCH_SIZE = 500
+
+
+def _module_count(course_id):
+    return db.select(db.func.count(modules_table.c.id)).where(
+        modules_table.c.course_id == course_id,
+        modules_table.c.status == 'published'
+    ).scalar_subquery()
+
+
+def _assessment_count(course_id):
+    return db.select(db.func.count(assessments_table.c.id)).where(
+        assessments_table.c.course_id == course_id,
+        assessments_table.c.status == 'published'
+    ).scalar_subquery()
+
+
+def _completed_count(user_id, course_id):
+    return db.select(db.func.count(db.distinct(results_table.c.assessment_id))).select_from(
+        results_table.join(assessments_table, assessments_table.c.id == results_table.c.assessment_id)
+    ).where(
+        results_table.c.user_id == user_id,
+        assessments_table.c.course_id == course_id,
+        assessments_table.c.status == 'published'
+    ).scalar_subquery()
+
+
+def _graded_count(user_id, course_id):
+    return db.select(db.func.count(db.distinct(results_table.c.assessment_id))).select_from(
+        results_table.join(assessments_table, assessments_table.c.id == results_table.c.assessment_id)
+    ).where(
+        results_table.c.user_id == user_id,
+        assessments_table.c.course_id == course_id,
+        assessments_table.c.status == 'published',
+        results_table.c.status == 'graded'
+    ).scalar_subquery()
+
+
+def _percentage(user_id, course_id):
+    """Percentage of the course's assessments with a graded result, from course_progress"""
+    return db.select(db.case(
+        (progress_table.c.total_assessments > 0,
+         progress_table.c.graded_assessments * 100.0 / progress_table.c.total_assessments),
+        else_=0.0
+    )).where(
+        progress_table.c.user_id == user_id,
+        progress_table.c.course_id == course_id
+    ).scalar_subquery()
+
+
+def _sync_enrollments(connection, *criteria, reopen=False):
+    """Copy course_progress percentages onto the matching enrollment rows.
+
+    Active enrollments that reach 100% become completed; dropped ones are
+    left alone. With ``reopen``, completed enrollments that fell below 100%
+    (a new assessment was published, a grade was withdrawn) become active
+    again.
+    """
+    connection.execute(
+        enrollments_table.update().where(*criteria).values(
+            progress_percentage=db.func.coalesce(
+                _percentage(enrollments_table.c.user_id, enrollments_table.c.course_id), 0.0
+            )
+        )
+    )
+    connection.execute(
+        enrollments_table.update().where(
+            *criteria,
+            enrollments_table.c.progress_percentage >= 100,
+            enrollments_table.c.status == 'active'
+        ).values(status='completed', completed_at=datetime.utcnow())
+    )
+    if reopen:
+        connection.execute(
+            enrollments_table.update().where(
+                *criteria,
+                enrollments_table.c.progress_percentage < 100,
+                enrollments_table.c.status == 'completed'
+            ).values(status='active', completed_at=None)
+        )
+
+
+def rebuild_progress(connection, course_id=None):
+    """Regenerate progress rows from enrollments, modules, assessments and results"""
+    delete = progress_table.delete()
+    enrollments = db.select(
+        enrollments_table.c.user_id,
+        enrollments_table.c.course_id,
+        _module_count(enrollments_table.c.course_id),
+        _assessment_count(enrollments_table.c.course_id),
+        _completed_count(enrollments_table.c.user_id, enrollments_table.c.course_id),
+        _graded_count(enrollments_table.c.user_id, enrollments_table.c.course_id),
+        db.literal(datetime.utcnow())
+    )
+    criteria = []
+    if course_id is not None:
+        delete = delete.where(progress_table.c.course_id == course_id)
+        enrollments = enrollments.where(enrollments_table.c.course_id == course_id)
+        criteria.append(enrollments_table.c.course_id == course_id)
+
+    connection.execute(delete)
+    result = connection.execute(progress_table.insert().from_select(
+        ['user_id', 'course_id', 'total_modules', 'total_assessments',
+         'completed_assessments', 'graded_assessments', 'updated_at'],
+        enrollments
+    ))
+    _sync_enrollments(connection, *criteria)
+    return result.rowcount
+
+
+@db.event.listens_for(db.metadata, 'after_create')
+def _backfill_progress(target, connection, tables=(), **kw):
+    # create_all on a database from before course_progress existed adds an
+    # empty table, and the incremental updates only touch existing rows
+    if progress_table in tables:
+        rebuild_progress(connection)
+
+
+def _batches(items):
+    items = sorted(items)
+    for start in range(0, len(items), REFRESH_BATCH_SIZE):
+        yield items[start:start + REFRESH_BATCH_SIZE]
+
+
+def refresh_courses(connection, course_ids):
+    """Recount every progress row of the given courses (content was added, removed or (un)published)"""
+    for batch in _batches(course_ids):
+        connection.execute(
+            progress_table.update()
+            .where(progress_table.c.course_id.in_(batch))
+            .values(total_modules=_module_count(progress_table.c.course_id),
+                    total_assessments=_assessment_count(progress_table.c.course_id),
+                    completed_assessments=_completed_count(progress_table.c.user_id, progress_table.c.course_id),
+                    graded_assessments=_graded_count(progress_table.c.user_id, progress_table.c.course_id),
+                    updated_at=datetime.utcnow())
+        )
+        _sync_enrollments(connection, enrollments_table.c.course_id.in_(batch), reopen=True)
+
+
+def refresh_students(connection, keys):
+    """Recount the result counters of the given ``(user_id, course_id)`` pairs.
+
+    A recount rather than an increment, so several results of one student
+    changing in the same flush (or a grade being withdrawn) still add up.
+    """
+    for batch in _batches(keys):
+        connection.execute(
+            progress_table.update()
+            .where(db.tuple_(progress_table.c.user_id, progress_table.c.course_id).in_(batch))
+            .values(completed_assessments=_completed_count(progress_table.c.user_id, progress_table.c.course_id),
+                    graded_assessments=_graded_count(progress_table.c.user_id, progress_table.c.course_id),
+                    updated_at=datetime.utcnow())
+        )
+        _sync_enrollments(connection,
+                          db.tuple_(enrollments_table.c.user_id, enrollments_table.c.course_id).in_(batch),
+                          reopen=True)
+
+
+def _queue(target, key, *values):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(key, set()).update(v for v in values if v is not None)
+
+
+def _previous(target, name):
+    history = db.inspect(target).attrs[name].history
+    return history.deleted[0] if history.deleted else None
+
+
+@db.event.listens_for(Enrollment, 'after_insert')
+def _enrollment_inserted(mapper, connection, target):
+    connection.execute(progress_table.insert().from_select(
+        ['user_id', 'course_id', 'total_modules', 'total_assessments',
+         'completed_assessments', 'graded_assessments', 'updated_at'],
+        db.select(
+            db.literal(target.user_id),
+            db.literal(target.course_id),
+            _module_count(target.course_id),
+            _assessment_count(target.course_id),
+            _completed_count(target.user_id, target.course_id),
+            _graded_count(target.user_id, target.course_id),
+            db.literal(datetime.utcnow())
+        )
+    ))
+    _sync_enrollments(connection,
+                      enrollments_table.c.user_id == target.user_id,
+                      enrollments_table.c.course_id == target.course_id)
+
+
+@db.event.listens_for(Enrollment, 'after_delete')
+def _enrollment_deleted(mapper, connection, target):
+    connection.execute(progress_table.delete().where(
+        progress_table.c.user_id == target.user_id,
+        progress_table.c.course_id == target.course_id
+    ))
+
+
+# Content and result changes are only noted per row; the recount runs once
+# per flush (_apply_progress), so grading a whole batch costs a handful of
+# statements instead of several per result
+
+@db.event.listens_for(Module, 'after_insert')
+@db.event.listens_for(Module, 'after_delete')
+@db.event.listens_for(Assessment, 'after_insert')
+@db.event.listens_for(Assessment, 'after_delete')
+def _content_added_or_removed(mapper, connection, target):
+    _queue(target, 'progress_courses', target.course_id)
+
+
+@db.event.listens_for(Module, 'after_update')
+@db.event.listens_for(Assessment, 'after_update')
+def _content_updated(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.status.history.has_changes() or state.attrs.course_id.history.has_changes():
+        _queue(target, 'progress_courses', target.course_id, _previous(target, 'course_id'))
+
+
+@db.event.listens_for(Result, 'after_insert')
+@db.event.listens_for(Result, 'after_delete')
+def _result_added_or_removed(mapper, connection, target):
+    _queue(target, 'progress_results', (target.user_id, target.assessment_id))
+
+
+@db.event.listens_for(Result, 'after_update')
+def _result_updated(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('status', 'user_id', 'assessment_id')):
+        _queue(target, 'progress_results', (target.user_id, target.assessment_id),
+               (_previous(target, 'user_id') or target.user_id,
+                _previous(target, 'assessment_id') or target.assessment_id))
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _apply_progress(session, flush_context):
+    courses = session.info.pop('progress_courses', set())
+    results = session.info.pop('progress_results', set())
+    if not (courses or results):
+        return
+
+    connection = session.connection()
+    if courses:
+        refresh_courses(connection, courses)
+    if results:
+        # One lookup for the courses of every assessment touched
+        course_of = {}
+        for batch in _batches({assessment_id for _, assessment_id in results}):
+            course_of.update(connection.execute(
+                db.select(assessments_table.c.id, assessments_table.c.course_id)
+                .where(assessments_table.c.id.in_(batch))
+            ).all())
+        # Courses recounted above already cover their students
+        keys = {(user_id, course_of[assessment_id]) for user_id, assessment_id in results
+                if assessment_id in course_of and course_of[assessment_id] not in courses}
+        if keys:
+            refresh_students(connection, keys)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_progress(session):
+    session.info.pop('progress_courses', None)
+    session.info.pop('progress_results', None)
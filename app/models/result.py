@@ -18,7 +18,11 @@ class Result(db.Model):
     graded_at = db.Column(db.DateTime)
     attempt_number = db.Column(db.Integer, default=1)
     
-    __table_args__ = (db.Index('idx_user_assessment', 'user_id', 'assessment_id'),)
+    __table_args__ = (
+        db.Index('idx_user_assessment', 'user_id', 'assessment_id'),
+        db.Index('idx_assessment_status', 'assessment_id', 'status'),
+        db.Index('idx_status_submitted', 'status', 'submitted_at', 'id'),
+    )
     
     def __repr__(self):
         return f'<Result user_id={self.user_id} assessment_id={self.assessment_id}>'
@@ -16,13 +16,19 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     full_name = db.Column(db.String(120), nullable=False)
-    role = db.Column(db.String(20), default='student', nullable=False)
+    role = db.Column(db.String(20), default='student', nullable=False, index=True)
     bio = db.Column(db.Text)
     avatar_url = db.Column(db.String(255))
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, onupdate=db.func.now())
     
+    # Bulk imports match usernames/emails case-insensitively: lower(x) IN (...)
+    __table_args__ = (
+        db.Index('idx_user_username_lower', db.func.lower(username)),
+        db.Index('idx_user_email_lower', db.func.lower(email)),
+    )
+    
     # Relationships
     enrollments = db.relationship('Enrollment', backref='user', lazy=True, cascade='all, delete-orphan')
     results = db.relationship('Result', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -48,4 +54,6 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Served from the per-worker identity cache; see app/services/identity.py
+    from app.services.identity import load_identity
+    return load_identity(int(user_id))
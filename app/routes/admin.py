@@ -1,9 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort, Response, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
 from app.models.course import Course
+from app.services.stats import get_admin_stats
+from app.services.spreadsheets import SPREADSHEET_EXTENSIONS, SpreadsheetError, read_rows
+from app.services.enrollments import import_enrollments
+from app.services.provisioning import start_import
+from app.models.job import Job
+from werkzeug.exceptions import RequestEntityTooLarge
+from app import metrics
+from app.instrumentation import allow_batched_queries
+from sqlalchemy.orm import joinedload
 from functools import wraps
+import hmac
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -20,16 +30,7 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    users = User.query.all()
-    courses = Course.query.all()
-    
-    stats = {
-        'total_users': len(users),
-        'total_students': sum(1 for u in users if u.is_student()),
-        'total_instructors': sum(1 for u in users if u.is_instructor()),
-        'total_courses': len(courses),
-        'published_courses': sum(1 for c in courses if c.is_published())
-    }
+    stats = get_admin_stats()
     
     return render_template('admin/dashboard.html', stats=stats)
 
@@ -80,7 +81,9 @@ def delete_user(user_id):
 @admin_required
 def manage_courses():
     page = request.args.get('page', 1, type=int)
-    courses = Course.query.paginate(page=page, per_page=20)
+    courses = Course.query.options(
+        joinedload(Course.instructor), db.undefer(Course.enrollment_count)
+    ).order_by(Course.id).paginate(page=page, per_page=20)
     
     return render_template('admin/manage_courses.html', courses=courses)
 
@@ -146,3 +149,105 @@ def delete_course(course_id):
     
     flash(f'Kursus {course.title} berhasil dihapus!', 'success')
     return redirect(url_for('admin.manage_courses'))
+
+@admin_bp.route('/enrollments/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_enrollments_view():
+    courses = db.session.query(Course.id, Course.title).order_by(Course.title).all()
+    report = None
+    
+    if request.method == 'POST':
+        try:
+            course_id = request.form.get('course_id', type=int)
+            upload = request.files.get('file')
+        except RequestEntityTooLarge:
+            flash('File terlalu besar.', 'danger')
+            return redirect(url_for('admin.import_enrollments_view'))
+        
+        course = db.session.get(Course, course_id) if course_id else None
+        if course is None:
+            flash('Pilih kursus tujuan terlebih dahulu.', 'danger')
+            return redirect(url_for('admin.import_enrollments_view'))
+        if not upload or not upload.filename:
+            flash('Pilih file CSV atau XLSX.', 'danger')
+            return redirect(url_for('admin.import_enrollments_view'))
+        
+        allow_batched_queries()
+        try:
+            report = import_enrollments(db.session.connection(), course.id, read_rows(upload.stream, upload.filename))
+        except SpreadsheetError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.import_enrollments_view'))
+        db.session.commit()
+        
+        flash(f'Alhamdulillah, {report.created} siswa terdaftar di {course.title}.', 'success')
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(report.to_dict())
+    
+    return render_template('admin/import_enrollments.html',
+                         courses=courses,
+                         report=report,
+                         extensions=SPREADSHEET_EXTENSIONS)
+
+@admin_bp.route('/users/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_users_view():
+    if request.method == 'POST':
+        try:
+            upload = request.files.get('file')
+        except RequestEntityTooLarge:
+            flash('File terlalu besar.', 'danger')
+            return redirect(url_for('admin.import_users_view'))
+        
+        if not upload or not upload.filename:
+            flash('Pilih file CSV atau XLSX.', 'danger')
+            return redirect(url_for('admin.import_users_view'))
+        if upload.filename.rsplit('.', 1)[-1].lower() not in SPREADSHEET_EXTENSIONS:
+            flash('Format file harus CSV atau XLSX.', 'danger')
+            return redirect(url_for('admin.import_users_view'))
+        
+        # Password hashing takes ~0.3s of CPU per account: run it in a worker
+        job = start_import(upload, current_user.id)
+        db.session.commit()
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(job.to_dict()), 202
+        flash('File diterima. Akun sedang dibuat, halaman ini akan diperbarui otomatis.', 'info')
+        return redirect(url_for('admin.import_users_status', job_id=job.id))
+    
+    return render_template('admin/import_users.html', job=None, report=None, extensions=SPREADSHEET_EXTENSIONS)
+
+@admin_bp.route('/users/import/<int:job_id>')
+@login_required
+@admin_required
+def import_users_status(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or job.kind != 'users.import':
+        abort(404)
+    report = job.to_dict()['result'] if job.status == 'done' else None
+    return render_template('admin/import_users.html', job=job, report=report, extensions=SPREADSHEET_EXTENSIONS)
+
+@admin_bp.route('/metrics')
+@login_required
+@admin_required
+def metrics_dashboard():
+    merged = metrics.collect(current_app.config.get('METRICS_DIR'),
+                             current_app.config.get('METRICS_SNAPSHOT_MAX_AGE'))
+    endpoints = sorted(merged['endpoints'].items(), key=lambda item: item[1]['sum'], reverse=True)
+    
+    return render_template('admin/metrics.html', metrics=merged, endpoints=endpoints)
+
+@admin_bp.route('/metrics/prometheus')
+def metrics_prometheus():
+    # Scrapers authenticate with the bearer token; admins can use their session
+    token = current_app.config.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(auth, f'Bearer {token}')
+    if not token_ok and not (current_user.is_authenticated and current_user.is_admin()):
+        abort(403)
+    
+    merged = metrics.collect(current_app.config.get('METRICS_DIR'),
+                             current_app.config.get('METRICS_SNAPSHOT_MAX_AGE'))
+    return Response(metrics.render_prometheus(merged), mimetype='text/plain; version=0.0.4')
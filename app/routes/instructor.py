@@ -1,11 +1,20 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort, send_file
 from flask_login import login_required, current_user
 from app import db
 from app.models.course import Course, Enrollment
 from app.models.module import Module
 from app.models.assessment import Assessment
 from app.models.result import Result
+from app.models.job import Job
+from sqlalchemy.orm import contains_eager, joinedload
+from app.services.stats import get_instructor_stats, get_instructor_courses
+from app.services.grading import compile_questions, grade_result
+from app.services.media import send_media
+from app.services.uploads import resolve_upload
+from app.services.gradebook import GRADEBOOK_MODES, write_gradebook
+from app.services.documents import DOCUMENT_KINDS, archive_path, start_export
 from functools import wraps
+from datetime import datetime
 
 instructor_bp = Blueprint('instructor', __name__, url_prefix='/instructor')
 
@@ -50,14 +59,8 @@ def create_course():
 @login_required
 @instructor_required
 def dashboard():
-    courses = Course.query.filter_by(instructor_id=current_user.id).all()
-    
-    stats = {
-        'total_courses': len(courses),
-        'published_courses': sum(1 for c in courses if c.is_published()),
-        'total_students': sum(len(c.enrollments) for c in courses),
-        'pending_reviews': Result.query.filter_by(status='submitted').count()
-    }
+    courses = get_instructor_courses(current_user.id)
+    stats = get_instructor_stats(current_user.id)
     
     return render_template('instructor/dashboard.html', courses=courses, stats=stats)
 
@@ -86,14 +89,87 @@ def manage_course(course_id):
         flash('Alhamdulillah, perubahan tersimpan. Semoga berkah untuk pengajaran Anda.', 'success')
         return redirect(url_for('instructor.manage_course', course_id=course_id))
     
-    modules = Module.query.filter_by(course_id=course_id).order_by(Module.order).all()
-    enrollments = Enrollment.query.filter_by(course_id=course_id).all()
+    modules = Module.query.options(db.undefer(Module.assessment_count)).filter_by(
+        course_id=course_id
+    ).order_by(Module.order).all()
+    enrollments = Enrollment.query.options(joinedload(Enrollment.user)).filter_by(
+        course_id=course_id
+    ).all()
     
     return render_template('instructor/manage_course.html', 
                          course=course, 
                          modules=modules,
                          enrollments=enrollments)
 
+@instructor_bp.route('/course/<int:course_id>/gradebook.xlsx')
+@login_required
+@instructor_required
+def export_gradebook(course_id):
+    course = Course.query.get_or_404(course_id)
+    
+    # Check ownership
+    if course.instructor_id != current_user.id:
+        flash('Anda tidak memiliki akses ke kursus ini.', 'danger')
+        return redirect(url_for('instructor.dashboard'))
+    
+    mode = request.args.get('mode', 'best')
+    if mode not in GRADEBOOK_MODES:
+        abort(400)
+    
+    # Temporary file is removed when the response closes it
+    return send_file(write_gradebook(course.id, mode),
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                     as_attachment=True,
+                     download_name=f'nilai-kursus-{course.id}-{mode}.xlsx',
+                     max_age=0)
+
+@instructor_bp.route('/course/<int:course_id>/documents', methods=['POST'])
+@login_required
+@instructor_required
+def export_documents(course_id):
+    course = Course.query.get_or_404(course_id)
+    
+    # Check ownership
+    if course.instructor_id != current_user.id:
+        flash('Anda tidak memiliki akses ke kursus ini.', 'danger')
+        return redirect(url_for('instructor.dashboard'))
+    
+    kind = request.form.get('kind', 'report')
+    if kind not in DOCUMENT_KINDS:
+        abort(400)
+    
+    job = start_export(course.id, kind, current_user.id)
+    db.session.commit()
+    flash('Dokumen sedang disiapkan. Halaman ini akan diperbarui otomatis.', 'info')
+    return redirect(url_for('instructor.document_export', job_id=job.id))
+
+def _owned_export(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or job.kind != 'documents.export' or job.user_id != current_user.id:
+        abort(404)
+    course = db.session.get(Course, job.args['course_id'])
+    if course is None or course.instructor_id != current_user.id:
+        abort(404)
+    return job, course
+
+@instructor_bp.route('/documents/<int:job_id>')
+@login_required
+@instructor_required
+def document_export(job_id):
+    job, course = _owned_export(job_id)
+    return render_template('instructor/document_export.html', job=job, kind=job.args['kind'], course=course)
+
+@instructor_bp.route('/documents/<int:job_id>/download')
+@login_required
+@instructor_required
+def download_documents(job_id):
+    job, course = _owned_export(job_id)
+    if job.status != 'done':
+        abort(404)
+    name = 'sertifikat' if job.args['kind'] == 'certificate' else 'laporan'
+    return send_file(archive_path(job.id), mimetype='application/zip', as_attachment=True,
+                     download_name=f'{name}-kursus-{course.id}.zip', max_age=0)
+
 @instructor_bp.route('/module/create/<int:course_id>', methods=['GET', 'POST'])
 @login_required
 @instructor_required
@@ -126,6 +202,8 @@ def create_module(course_id):
         )
         
         db.session.add(module)
+        # Bumping the course version invalidates its cached student pages
+        course.updated_at = datetime.utcnow()
         db.session.commit()
         
         flash('Alhamdulillah, modul berhasil dibuat! Semoga mempermudah proses hafalan.', 'success')
@@ -137,7 +215,7 @@ def create_module(course_id):
 @login_required
 @instructor_required
 def create_assessment(module_id):
-    module = Module.query.get_or_404(module_id)
+    module = Module.query.options(joinedload(Module.course)).filter_by(id=module_id).first_or_404()
     course = module.course
     
     # Check ownership
@@ -152,6 +230,15 @@ def create_assessment(module_id):
         instructions = request.form.get('instructions')
         max_score = request.form.get('max_score', 100, type=float)
         status = request.form.get('status', 'draft')
+        questions = request.form.get('questions', '').strip() or None
+        
+        # Validate the answer key up front so quizzes can be auto-graded
+        if assessment_type == 'quiz' and questions:
+            try:
+                compile_questions(questions)
+            except ValueError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('instructor.create_assessment', module_id=module_id))
         
         assessment = Assessment(
             module_id=module_id,
@@ -160,11 +247,13 @@ def create_assessment(module_id):
             description=description,
             assessment_type=assessment_type,
             instructions=instructions,
+            questions=questions,
             max_score=max_score,
             status=status
         )
         
         db.session.add(assessment)
+        module.updated_at = datetime.utcnow()
         db.session.commit()
         
         flash('Alhamdulillah, penilaian berhasil dibuat! Semoga adil dan bermanfaat.', 'success')
@@ -176,22 +265,68 @@ def create_assessment(module_id):
 @login_required
 @instructor_required
 def review_submissions():
-    # Get all submissions for courses taught by this instructor
-    courses = Course.query.filter_by(instructor_id=current_user.id).all()
-    course_ids = [c.id for c in courses]
+    course_id = request.args.get('course_id', type=int)
+    assessment_id = request.args.get('assessment_id', type=int)
+    cursor = request.args.get('after')
+    per_page = current_app.config.get('REVIEW_PAGE_SIZE', 50)
     
-    submissions = Result.query.join(Assessment).filter(
-        Assessment.course_id.in_(course_ids),
-        Result.status.in_(['submitted', 'pending'])
-    ).all()
+    # Oldest submissions first; eager-load what the template renders
+    query = _owned_results_query(['submitted', 'pending']).options(
+        contains_eager(Result.assessment), joinedload(Result.user)
+    )
+    if course_id:
+        query = query.filter(Assessment.course_id == course_id)
+    if assessment_id:
+        query = query.filter(Result.assessment_id == assessment_id)
+    
+    after = _decode_cursor(cursor)
+    if after:
+        submitted_at, last_id = after
+        query = query.filter(db.or_(
+            Result.submitted_at > submitted_at,
+            db.and_(Result.submitted_at == submitted_at, Result.id > last_id)
+        ))
     
-    return render_template('instructor/review_submissions.html', submissions=submissions)
+    submissions = query.order_by(Result.submitted_at, Result.id).limit(per_page + 1).all()
+    next_cursor = None
+    if len(submissions) > per_page:
+        submissions = submissions[:per_page]
+        next_cursor = _encode_cursor(submissions[-1])
+    
+    courses = db.session.query(Course.id, Course.title).filter(
+        Course.instructor_id == current_user.id
+    ).order_by(Course.title).all()
+    
+    return render_template('instructor/review_submissions.html',
+                         submissions=submissions,
+                         courses=courses,
+                         course_id=course_id,
+                         assessment_id=assessment_id,
+                         cursor=cursor,
+                         next_cursor=next_cursor)
+
+def _encode_cursor(result):
+    return f'{result.submitted_at.isoformat()}_{result.id}'
+
+def _decode_cursor(cursor):
+    """Parse a ``<submitted_at>_<id>`` keyset cursor; invalid cursors restart the queue"""
+    if not cursor:
+        return None
+    try:
+        submitted_at, last_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(submitted_at), int(last_id)
+    except ValueError:
+        return None
 
 @instructor_bp.route('/review/submit/<int:result_id>', methods=['GET', 'POST'])
 @login_required
 @instructor_required
 def grade_submission(result_id):
-    result = Result.query.get_or_404(result_id)
+    result = Result.query.options(
+        joinedload(Result.user),
+        joinedload(Result.assessment).joinedload(Assessment.course),
+        joinedload(Result.assessment).joinedload(Assessment.module)
+    ).filter_by(id=result_id).first_or_404()
     assessment = result.assessment
     course = assessment.course
     
@@ -204,10 +339,11 @@ def grade_submission(result_id):
         score = request.form.get('score', type=float)
         feedback = request.form.get('feedback', '')
         
-        result.score = score
-        result.percentage = (score / result.max_score) * 100
-        result.feedback = feedback
-        result.status = 'graded'
+        try:
+            grade_result(result, score, feedback, assessment.max_score)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('instructor.grade_submission', result_id=result_id))
         
         db.session.commit()
         
@@ -215,3 +351,178 @@ def grade_submission(result_id):
         return redirect(url_for('instructor.review_submissions'))
     
     return render_template('instructor/grade_submission.html', result=result)
+
+@instructor_bp.route('/review/submit/<int:result_id>/file')
+@login_required
+@instructor_required
+def submission_file(result_id):
+    result = _owned_results_query().filter(Result.id == result_id).first_or_404()
+    resolved = resolve_upload(result.submission_file_url)
+    if resolved is None:
+        abort(404)
+    
+    relative, path, filename = resolved
+    return send_media(relative, path,
+                      accel_prefix=current_app.config.get('UPLOAD_X_ACCEL_PREFIX') or '',
+                      download_name=filename)
+
+
+def _owned_course_ids():
+    return db.select(Course.id).where(Course.instructor_id == current_user.id)
+
+def _owned_results_query(result_status=None):
+    """Results for assessments in the current instructor's courses"""
+    query = Result.query.join(Result.assessment).filter(
+        Assessment.course_id.in_(_owned_course_ids())
+    )
+    
+    if result_status:
+        query = query.filter(Result.status.in_(result_status))
+    return query
+
+BATCH_FILTER_KEYS = ('assessment_id', 'course_id')
+
+def _as_id(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f'ID tidak valid: {value!r}')
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'ID tidak valid: {value!r}')
+
+def _parse_batch_request():
+    """Normalize a JSON or form batch-grading request into grades and a template.
+
+    Raises ValueError for malformed input, including a "filtered" request
+    that names no assessment or course (which would otherwise match every
+    pending submission the instructor owns).
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            raise ValueError('Permintaan harus berupa objek JSON.')
+        items = payload.get('grades') or []
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError('"grades" harus berupa daftar objek.')
+        grades = {}
+        for item in items:
+            if 'result_id' in item:
+                grades[_as_id(item['result_id'])] = (item.get('score'), item.get('feedback'))
+        template = payload.get('template') or {}
+        raw_filter = payload.get('filter') or {}
+        if not isinstance(template, dict) or not isinstance(raw_filter, dict):
+            raise ValueError('"template" dan "filter" harus berupa objek.')
+        unknown = set(raw_filter) - set(BATCH_FILTER_KEYS)
+        if unknown:
+            raise ValueError(f'Filter tidak dikenal: {", ".join(sorted(unknown))}.')
+        filters = {key: _as_id(value) for key, value in raw_filter.items() if value is not None}
+        if raw_filter and not filters:
+            raise ValueError('Filter harus menyebut assessment_id atau course_id.')
+        return grades, template.get('score'), template.get('feedback'), filters
+    
+    grades = {}
+    for result_id in request.form.getlist('result_id', type=int):
+        grades[result_id] = (
+            request.form.get(f'score_{result_id}', type=float),
+            request.form.get(f'feedback_{result_id}') or None
+        )
+    filters = {}
+    if request.form.get('apply_to') == 'filtered':
+        for key in BATCH_FILTER_KEYS:
+            value = request.form.get(key, type=int)
+            if value is not None:
+                filters[key] = value
+        if not filters:
+            raise ValueError('Pilih penilaian atau kursus sebelum menerapkan nilai ke semua pengumpulan.')
+    return (grades,
+            request.form.get('template_score', type=float),
+            request.form.get('template_feedback') or None,
+            filters)
+
+def _batch_errors(errors):
+    db.session.rollback()
+    if request.is_json:
+        return jsonify({'graded': 0, 'errors': errors}), 400
+    for error in errors:
+        flash(error, 'danger')
+    # Never back to request.referrer: it is client-controlled
+    return redirect(url_for('instructor.grade_batch',
+                            assessment_id=request.form.get('assessment_id', type=int),
+                            course_id=request.form.get('course_id', type=int)))
+
+@instructor_bp.route('/review/batch', methods=['GET', 'POST'])
+@login_required
+@instructor_required
+def grade_batch():
+    if request.method == 'POST':
+        try:
+            grades, template_score, template_feedback, filters = _parse_batch_request()
+        except ValueError as e:
+            return _batch_errors([str(e)])
+        
+        # Resolve and ownership-check the whole selection in one query
+        query = _owned_results_query().options(contains_eager(Result.assessment))
+        if filters:
+            query = query.filter(Result.status.in_(['submitted', 'pending']))
+            if 'assessment_id' in filters:
+                query = query.filter(Result.assessment_id == filters['assessment_id'])
+            if 'course_id' in filters:
+                query = query.filter(Assessment.course_id == filters['course_id'])
+        else:
+            query = query.filter(Result.id.in_(grades.keys()))
+        results = query.all() if (grades or filters) else []
+        
+        errors = []
+        if not filters and len(results) != len(grades):
+            errors.append('Sebagian pengumpulan tidak ditemukan atau bukan milik kursus Anda.')
+        elif not results:
+            errors.append('Tidak ada pengumpulan yang dipilih.')
+        else:
+            for result in results:
+                score, feedback = grades.get(result.id, (None, None))
+                score = template_score if score is None else score
+                feedback = template_feedback if feedback is None else feedback
+                try:
+                    grade_result(result, None if score is None else float(score),
+                                 feedback or '', result.assessment.max_score)
+                except (TypeError, ValueError) as e:
+                    errors.append(f'#{result.id}: {e}')
+        
+        # All-or-nothing: a single bad row rejects the whole batch
+        if errors:
+            return _batch_errors(errors)
+        
+        # Read before the commit expires them, or each id is a reload
+        result_ids = [r.id for r in results]
+        db.session.commit()
+        
+        if request.is_json:
+            return jsonify({'graded': len(result_ids), 'result_ids': result_ids})
+        flash(f'Alhamdulillah, {len(result_ids)} nilai tersimpan sekaligus.', 'success')
+        return redirect(url_for('instructor.grade_batch',
+                                assessment_id=request.form.get('assessment_id', type=int),
+                                course_id=request.form.get('course_id', type=int)))
+    
+    assessment_id = request.args.get('assessment_id', type=int)
+    course_id = request.args.get('course_id', type=int)
+    limit = current_app.config.get('BATCH_GRADING_LIMIT', 200)
+    
+    query = _owned_results_query(['submitted', 'pending']).options(
+        contains_eager(Result.assessment), joinedload(Result.user)
+    )
+    if assessment_id:
+        query = query.filter(Result.assessment_id == assessment_id)
+    if course_id:
+        query = query.filter(Assessment.course_id == course_id)
+    submissions = query.order_by(Result.submitted_at, Result.id).limit(limit).all()
+    
+    assessments = Assessment.query.filter(
+        Assessment.course_id.in_(_owned_course_ids())
+    ).order_by(Assessment.course_id, Assessment.id).all()
+    
+    return render_template('instructor/grade_batch.html',
+                         submissions=submissions,
+                         assessments=assessments,
+                         assessment_id=assessment_id,
+                         course_id=course_id,
+                         limit=limit)
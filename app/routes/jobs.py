@@ -0,0 +1,15 @@
+from flask import Blueprint, abort, jsonify
+from flask_login import login_required, current_user
+from app import db
+from app.models.job import Job
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+@jobs_bp.route('/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Poll a background job: its status, attempts, and result once done"""
+    job = db.session.get(Job, job_id)
+    if job is None or not (current_user.is_admin() or job.user_id == current_user.id):
+        abort(404)
+    return jsonify(job.to_dict())
@@ -0,0 +1,45 @@
+from flask import Blueprint, abort, redirect
+from flask_login import login_required, current_user
+from sqlalchemy.orm import defer, joinedload
+from app.models.course import Enrollment
+from app.models.module import Module
+from app.services.media import resolve_media_path, send_media
+
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+def can_access_course(course):
+    """Admins, the course's instructor and actively enrolled students"""
+    if current_user.is_admin():
+        return True
+    if current_user.is_instructor():
+        return course.instructor_id == current_user.id
+    return Enrollment.query.filter(
+        Enrollment.user_id == current_user.id,
+        Enrollment.course_id == course.id,
+        Enrollment.status != 'dropped'
+    ).first() is not None
+
+@media_bp.route('/module/<int:module_id>')
+@login_required
+def module_media(module_id):
+    module = Module.query.options(defer(Module.content), joinedload(Module.course)).filter_by(id=module_id).first_or_404()
+    if not can_access_course(module.course):
+        abort(403)
+
+    resolved = resolve_media_path(module.file_url)
+    if resolved is None:
+        # External links (YouTube, CDN, ...) are served by their own host
+        if module.file_url and '://' in module.file_url:
+            return redirect(module.file_url)
+        abort(404)
+
+    return send_media(*resolved)
+
+@media_bp.route('/audio/<path:filename>')
+@login_required
+def shared_audio(filename):
+    """Shared recitations (not tied to a course), e.g. the pre-assessment du'a"""
+    resolved = resolve_media_path(f'audio/{filename}')
+    if resolved is None:
+        abort(404)
+    return send_media(*resolved)
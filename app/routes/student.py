@@ -1,10 +1,21 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models.course import Course, Enrollment
 from app.models.module import Module
 from app.models.assessment import Assessment
 from app.models.result import Result
+from app.models.progress import CourseProgress
+from app.services.grading import get_answer_key, score_quiz, apply_quiz_score
+from app.services.fragments import render_fragment, version_of
+from app.services.conditional import ContentValidators, latest
+from app.services.media import is_local_media
+from app.services.uploads import allowed_upload, store_upload
+from app.services.search import search as search_index
+from werkzeug.exceptions import RequestEntityTooLarge
+import json
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, joinedload
 from functools import wraps
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
@@ -22,7 +33,10 @@ def student_required(f):
 @login_required
 @student_required
 def dashboard():
-    enrollments = Enrollment.query.filter_by(user_id=current_user.id, status='active').all()
+    enrollments = Enrollment.query.options(joinedload(Enrollment.course)).filter(
+        Enrollment.user_id == current_user.id,
+        Enrollment.status != 'dropped'
+    ).all()
 
     # Build list of courses with precomputed progress to avoid DB calls in templates
     courses_with_progress = []
@@ -38,7 +52,7 @@ def dashboard():
     stats = {
         'total_courses': total_courses,
         'completed_assessments': completed_assessments,
-        'active_enrollments': total_courses
+        'active_enrollments': sum(1 for e in enrollments if e.status == 'active')
     }
 
     return render_template('student/dashboard.html', courses=courses_with_progress, stats=stats)
@@ -47,7 +61,9 @@ def dashboard():
 @login_required
 @student_required
 def course(course_id):
-    course = Course.query.get_or_404(course_id)
+    # The header shows the instructor's name, so their row versions the page too
+    course = Course.query.options(joinedload(Course.instructor)).filter_by(id=course_id).first_or_404()
+    instructor = course.instructor
     
     # Check enrollment
     enrollment = Enrollment.query.filter_by(user_id=current_user.id, course_id=course_id).first()
@@ -55,15 +71,42 @@ def course(course_id):
         flash('Anda belum terdaftar di kursus ini.', 'warning')
         return redirect(url_for('student.dashboard'))
     
-    modules = Module.query.filter_by(course_id=course_id, status='published').order_by(Module.order).all()
+    version = version_of(course)
+    instructor_version = f'{instructor.id}:{version_of(instructor)}'
+    validators = ContentValidators(
+        'course', course_id, version, instructor_version, enrollment.status, enrollment.progress_percentage,
+        last_modified=latest(course.updated_at, course.created_at, instructor.updated_at,
+                             enrollment.enrolled_at, enrollment.completed_at)
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
     
-    return render_template('student/course.html', course=course, modules=modules, enrollment=enrollment)
+    # Shared parts are cached per course version; only progress is per student
+    header = render_fragment(
+        f'course:{course_id}:{version}:header:{instructor_version}',
+        'student/_course_header.html',
+        lambda: {'course': course}
+    )
+    modules = render_fragment(
+        f'course:{course_id}:{version}:modules',
+        'student/_course_modules.html',
+        lambda: {'modules': Module.query.filter_by(
+            course_id=course_id, status='published'
+        ).order_by(Module.order).all()}
+    )
+    
+    return validators.apply(render_template('student/course.html', course=course, enrollment=enrollment,
+                                            header=header, modules=modules))
 
 @student_bp.route('/module/<int:module_id>')
 @login_required
 @student_required
 def module(module_id):
-    module = Module.query.get_or_404(module_id)
+    # The content blob is only loaded when the cached fragment is stale
+    module = Module.query.options(
+        defer(Module.content), joinedload(Module.course)
+    ).filter_by(id=module_id).first_or_404()
     course = module.course
     
     # Check enrollment in course
@@ -72,15 +115,34 @@ def module(module_id):
         flash('Anda belum terdaftar di kursus ini.', 'warning')
         return redirect(url_for('student.dashboard'))
     
-    assessments = Assessment.query.filter_by(module_id=module_id, status='published').all()
+    validators = ContentValidators(
+        'module', module_id, version_of(module), version_of(course),
+        last_modified=latest(module.updated_at, module.created_at,
+                             course.updated_at, course.created_at)
+    )
+    not_modified = validators.not_modified()
+    if not_modified is not None:
+        return not_modified
+    
+    body = render_fragment(
+        f'module:{module_id}:{version_of(module)}',
+        'student/_module_body.html',
+        lambda: {
+            'module': module,
+            'assessments': Assessment.query.filter_by(module_id=module_id, status='published').all(),
+            'media_url': url_for('media.module_media', module_id=module_id) if is_local_media(module.file_url) else None
+        }
+    )
     
-    return render_template('student/module.html', module=module, course=course, assessments=assessments)
+    return validators.apply(render_template('student/module.html', module=module, course=course, body=body))
 
 @student_bp.route('/assessment/<int:assessment_id>', methods=['GET', 'POST'])
 @login_required
 @student_required
 def assessment(assessment_id):
-    assessment = Assessment.query.get_or_404(assessment_id)
+    assessment = Assessment.query.options(
+        joinedload(Assessment.module).joinedload(Module.course)
+    ).filter_by(id=assessment_id).first_or_404()
     module = assessment.module
     course = module.course
     
@@ -95,54 +157,179 @@ def assessment(assessment_id):
         user_id=current_user.id,
         assessment_id=assessment_id
     ).first()
+    answer_key = get_answer_key(assessment)
     
     if request.method == 'POST':
         if existing_result and not assessment.allow_multiple_attempts:
             flash('MashaAllah, Anda sudah mengerjakan assessment ini.', 'warning')
             return redirect(url_for('student.module', module_id=module.id))
         
-        submission_text = request.form.get('submission_text', '')
-        
-        result = Result(
-            user_id=current_user.id,
-            assessment_id=assessment_id,
-            submission_text=submission_text,
-            status='submitted'
-        )
+        if answer_key:
+            # Quizzes with an answer key are graded on the spot
+            answers = {q.field: request.form.get(q.field) for q in answer_key.questions}
+            result = Result(
+                user_id=current_user.id,
+                assessment_id=assessment_id,
+                submission_text=json.dumps(answers, ensure_ascii=False)
+            )
+            quiz_score = score_quiz(answer_key, answers, assessment.max_score)
+            apply_quiz_score(result, quiz_score)
+        else:
+            # Uploads are spooled to disk as they arrive (see UploadRequest)
+            try:
+                submission_text = request.form.get('submission_text', '')
+                upload = request.files.get('submission_file')
+            except RequestEntityTooLarge:
+                limit_mb = current_app.config['UPLOAD_MAX_BYTES'] // (1024 * 1024)
+                flash(f'File terlalu besar. Maksimal {limit_mb} MB.', 'danger')
+                return redirect(url_for('student.assessment', assessment_id=assessment_id))
+            
+            submission_file_url = None
+            if upload and upload.filename:
+                if not allowed_upload(upload.filename):
+                    flash('Jenis file tidak didukung.', 'danger')
+                    return redirect(url_for('student.assessment', assessment_id=assessment_id))
+                submission_file_url = store_upload(upload)
+            
+            if not submission_text.strip() and not submission_file_url:
+                flash('Tuliskan jawaban atau unggah file terlebih dahulu.', 'warning')
+                return redirect(url_for('student.assessment', assessment_id=assessment_id))
+            
+            # Text and file land in the same row, in one commit
+            result = Result(
+                user_id=current_user.id,
+                assessment_id=assessment_id,
+                submission_text=submission_text,
+                submission_file_url=submission_file_url,
+                status='submitted'
+            )
         
         db.session.add(result)
         db.session.commit()
         
         flash('Alhamdulillah, sudah dikerjakan. Semoga usaha ini bermanfaat dan diterima.', 'success')
+        if result.status == 'graded':
+            flash(f'Nilai Anda: {result.percentage:.0f}%. {result.feedback}', 'info')
         return redirect(url_for('student.module', module_id=module.id))
     
     return render_template('student/assessment.html', 
                          assessment=assessment, 
                          module=module,
                          course=course,
-                         existing_result=existing_result)
+                         existing_result=existing_result,
+                         answer_key=answer_key)
 
 @student_bp.route('/progress')
 @login_required
 @student_required
 def progress():
-    enrollments = Enrollment.query.filter_by(user_id=current_user.id).all()
+    rows = db.session.query(Enrollment, Course, CourseProgress).join(
+        Course, Course.id == Enrollment.course_id
+    ).outerjoin(
+        CourseProgress, db.and_(
+            CourseProgress.user_id == Enrollment.user_id,
+            CourseProgress.course_id == Enrollment.course_id
+        )
+    ).filter(Enrollment.user_id == current_user.id).all()
     
     progress_data = []
-    for enrollment in enrollments:
-        course = enrollment.course
-        modules = Module.query.filter_by(course_id=course.id).count()
-        assessments = Assessment.query.filter_by(course_id=course.id).count()
-        completed = Result.query.filter_by(
-            user_id=current_user.id
-        ).join(Assessment).filter(Assessment.course_id == course.id).count()
-        
+    for enrollment, course, course_progress in rows:
         progress_data.append({
             'course': course,
             'enrollment': enrollment,
-            'modules': modules,
-            'assessments': assessments,
-            'completed_assessments': completed
+            'modules': course_progress.total_modules if course_progress else 0,
+            'assessments': course_progress.total_assessments if course_progress else 0,
+            'completed_assessments': course_progress.completed_assessments if course_progress else 0
         })
     
     return render_template('student/progress.html', progress_data=progress_data)
+
+@student_bp.route('/search')
+@login_required
+@student_required
+def search():
+    query = request.args.get('q', '').strip()
+    results = search_index(query, limit=current_app.config.get('SEARCH_RESULTS_LIMIT', 20)) if query else []
+    
+    enrolled_ids = set()
+    if results:
+        enrolled_ids = {course_id for (course_id,) in db.session.query(Enrollment.course_id).filter(
+            Enrollment.user_id == current_user.id,
+            Enrollment.status != 'dropped',
+            Enrollment.course_id.in_({r['course_id'] for r in results})
+        )}
+    
+    return render_template('student/search.html', query=query, results=results, enrolled_ids=enrolled_ids)
+
+COURSE_LEVELS = ('beginner', 'intermediate', 'advanced')
+
+@student_bp.route('/catalog')
+@login_required
+@student_required
+def catalog():
+    category = request.args.get('category') or None
+    level = request.args.get('level') or None
+    after = request.args.get('after', type=int)
+    per_page = current_app.config.get('CATALOG_PAGE_SIZE', 12)
+    
+    # Served by idx_course_catalog; counts come from the deferred subquery
+    query = Course.query.options(
+        joinedload(Course.instructor), db.undefer(Course.enrollment_count)
+    ).filter(Course.status == 'published')
+    if category:
+        query = query.filter(Course.category == category)
+    if level:
+        query = query.filter(Course.level == level)
+    if after:
+        query = query.filter(Course.id < after)
+    
+    courses = query.order_by(Course.id.desc()).limit(per_page + 1).all()
+    next_after = None
+    if len(courses) > per_page:
+        courses = courses[:per_page]
+        next_after = courses[-1].id
+    
+    enrolled_ids = set()
+    if courses:
+        enrolled_ids = {course_id for (course_id,) in db.session.query(Enrollment.course_id).filter(
+            Enrollment.user_id == current_user.id,
+            Enrollment.status != 'dropped',
+            Enrollment.course_id.in_([c.id for c in courses])
+        )}
+    
+    categories = [c for (c,) in db.session.query(Course.category).filter(
+        Course.status == 'published', Course.category.isnot(None)
+    ).distinct().order_by(Course.category)]
+    
+    return render_template('student/catalog.html',
+                         courses=courses,
+                         enrolled_ids=enrolled_ids,
+                         categories=categories,
+                         levels=COURSE_LEVELS,
+                         category=category,
+                         level=level,
+                         after=after,
+                         next_after=next_after)
+
+@student_bp.route('/catalog/<int:course_id>/enroll', methods=['POST'])
+@login_required
+@student_required
+def enroll(course_id):
+    course = Course.query.filter_by(id=course_id, status='published').first_or_404()
+    
+    # uq_user_course makes this idempotent: a second insert just fails
+    try:
+        db.session.add(Enrollment(user_id=current_user.id, course_id=course.id))
+        db.session.commit()
+        flash(f'Alhamdulillah, Anda terdaftar di {course.title}. Selamat belajar!', 'success')
+    except IntegrityError:
+        db.session.rollback()
+        enrollment = Enrollment.query.filter_by(user_id=current_user.id, course_id=course.id).first()
+        if enrollment.status == 'dropped':
+            enrollment.status = 'active'
+            db.session.commit()
+            flash(f'Alhamdulillah, Anda kembali terdaftar di {course.title}.', 'success')
+        else:
+            flash('MashaAllah, Anda sudah terdaftar di kursus ini.', 'info')
+    
+    return redirect(url_for('student.course', course_id=course.id))
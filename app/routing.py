@@ -0,0 +1,85 @@
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request
+from flask import session as flask_session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+READ_ONLY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+_PIN_KEY = '_db_primary_until'
+
+
+class RoutingSession(Session):
+    """Session that sends read-only requests to the replica bind.
+
+    Statements go to the primary when the session is flushing, outside of
+    a request, for non-GET requests, after this request wrote anything, or
+    while the user is pinned to the primary after their own write.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reads_from_replica():
+            if clause is not None and getattr(clause, 'is_dml', False):
+                # Core INSERT/UPDATE/DELETE issued outside a flush
+                _mark_write()
+            elif _uses_default_bind(mapper):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _uses_default_bind(mapper):
+    """Only models on the default bind have a replica"""
+    if mapper is None:
+        return True
+    table = sa.inspect(mapper).local_table
+    return table.metadata.info.get('bind_key') is None
+
+
+def _reads_from_replica():
+    return has_request_context() and bool(g.get('_db_use_replica'))
+
+
+def _mark_write():
+    g._db_use_replica = False
+    g._db_wrote = True
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    if has_request_context():
+        _mark_write()
+
+
+def _choose_bind():
+    pinned_until = flask_session.get(_PIN_KEY, 0)
+    g._db_use_replica = (
+        request.method in READ_ONLY_METHODS
+        and time.time() >= pinned_until
+    )
+
+
+def _pin_after_write(response):
+    # Read-your-writes: keep this user on the primary long enough for the
+    # replica to catch up with what they just changed
+    if g.get('_db_wrote'):
+        window = current_app.config.get('DB_READ_YOUR_WRITES_SECONDS', 5)
+        flask_session[_PIN_KEY] = time.time() + window
+    return response
+
+
+def use_primary():
+    """Force the rest of the current request onto the primary"""
+    if has_request_context():
+        g._db_use_replica = False
+
+
+def init_read_routing(app):
+    """Route read-only requests to the ``replica`` bind when one is configured"""
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    app.before_request(_choose_bind)
+    app.after_request(_pin_after_write)
@@ -0,0 +1,54 @@
+import hashlib
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+
+class ContentValidators:
+    """ETag / Last-Modified for a page built from versioned rows.
+
+    The ETag covers the content versions plus whatever the viewer sees of
+    their own state (identity, enrollment), so two students never share a
+    validator and progress changes still produce a fresh page.
+    """
+
+    def __init__(self, *parts, last_modified=None):
+        if current_user.is_authenticated:
+            viewer = (current_user.get_id(), current_user.full_name, current_user.role)
+        else:
+            viewer = ('anon',)
+        release = current_app.config.get('CONTENT_RELEASE', '')
+        raw = '|'.join(str(p) for p in (release, *viewer, *parts))
+        self.etag = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+        # A pending flash message is rendered into this one page, so neither
+        # answer it with a 304 nor let the browser keep it for later
+        self.cacheable = request.method in ('GET', 'HEAD') and not session.get('_flashes')
+
+    def not_modified(self):
+        """Return a 304 response if the client's copy is current, else None"""
+        if not self.cacheable:
+            return None
+        if is_resource_modified(request.environ, etag=self.etag, last_modified=self.last_modified):
+            return None
+        return self.apply(make_response('', 304))
+
+    def apply(self, response):
+        """Attach the validators to a full response"""
+        response = make_response(response)
+        if not self.cacheable:
+            return response
+        response.set_etag(self.etag)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        # Per-user pages: browsers may keep them but must revalidate each time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+
+def latest(*stamps):
+    """Most recent of the given timestamps, ignoring missing ones"""
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps) if stamps else None
@@ -0,0 +1,200 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import groupby
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app import db
+from app.jobs import enqueue, job
+from app.models.user import User
+from app.models.course import Course, Enrollment
+from app.models.module import Module
+from app.models.assessment import Assessment
+from app.models.result import Result
+
+DOCUMENT_KINDS = ('report', 'certificate')
+PASSING_SCORE = 70
+
+
+def export_dir(app=None):
+    app = app or current_app
+    return app.config.get('DOCUMENT_EXPORT_DIR') or os.path.join(app.instance_path, 'exports')
+
+
+def archive_path(job_id):
+    return os.path.join(export_dir(), f'documents-{job_id}.zip')
+
+
+def _course_data(course_id):
+    title, instructor = db.session.execute(
+        db.select(Course.title, User.full_name)
+        .join(User, User.id == Course.instructor_id)
+        .where(Course.id == course_id)
+    ).one()
+    assessments = db.session.execute(
+        db.select(Assessment.id, Module.title, Assessment.title)
+        .join(Module, Module.id == Assessment.module_id)
+        .where(Assessment.course_id == course_id)
+        .order_by(Module.order, Assessment.id)
+    ).all()
+    return {'title': title, 'instructor': instructor}, [tuple(a) for a in assessments]
+
+
+def _students(course_id, assessment_ids, kind):
+    """Plain dicts (picklable, for the render processes), one per enrolled student"""
+    query = (
+        db.select(User.id, User.full_name, User.username,
+                  Enrollment.enrolled_at, Enrollment.completed_at,
+                  Enrollment.progress_percentage, Enrollment.status,
+                  Result.assessment_id, Result.percentage)
+        .select_from(Enrollment)
+        .join(User, User.id == Enrollment.user_id)
+        .outerjoin(Result, db.and_(
+            Result.user_id == Enrollment.user_id,
+            Result.assessment_id.in_(assessment_ids),
+            Result.percentage.isnot(None)
+        ))
+        .where(Enrollment.course_id == course_id, Enrollment.status != 'dropped')
+        .order_by(User.full_name, User.id)
+    )
+    if kind == 'certificate':
+        query = query.where(db.or_(Enrollment.status == 'completed', Enrollment.progress_percentage >= 100))
+
+    for _, rows in groupby(db.session.execute(query), key=lambda row: row.id):
+        scores = {}
+        for row in rows:
+            if row.assessment_id is not None and row.percentage > scores.get(row.assessment_id, -1):
+                scores[row.assessment_id] = row.percentage
+        yield {'user_id': row.id, 'full_name': row.full_name, 'username': row.username,
+               'enrolled_at': row.enrolled_at, 'completed_at': row.completed_at,
+               'progress': row.progress_percentage or 0, 'status': row.status, 'scores': scores}
+
+
+def _date(value):
+    return value.strftime('%d %B %Y') if value else '-'
+
+
+def render_progress_report(course, assessments, student):
+    from docx import Document
+
+    document = Document()
+    document.add_heading('Laporan Kemajuan Belajar', level=0)
+    for label, value in (('Nama', student['full_name']),
+                         ('Username', student['username']),
+                         ('Kursus', course['title']),
+                         ('Instruktur', course['instructor']),
+                         ('Terdaftar sejak', _date(student['enrolled_at'])),
+                         ('Progres', f"{student['progress']:.0f}%"),
+                         ('Status', student['status'])):
+        paragraph = document.add_paragraph()
+        paragraph.add_run(f'{label}: ').bold = True
+        paragraph.add_run(str(value))
+
+    document.add_heading('Hasil Penilaian', level=1)
+    table = document.add_table(rows=1, cols=4)
+    table.style = 'Light Grid Accent 1'
+    for cell, text in zip(table.rows[0].cells, ('Modul', 'Penilaian', 'Nilai', 'Keterangan')):
+        cell.text = text
+    for assessment_id, module_title, title in assessments:
+        score = student['scores'].get(assessment_id)
+        if score is None:
+            remark = 'Belum dinilai'
+        else:
+            remark = 'Lulus' if score >= PASSING_SCORE else 'Belum lulus'
+        cells = table.add_row().cells
+        cells[0].text = module_title
+        cells[1].text = title
+        cells[2].text = '-' if score is None else f'{score:.1f}%'
+        cells[3].text = remark
+
+    document.add_paragraph(f'Dibuat pada {_date(datetime.utcnow())}')
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def render_certificate(course, assessments, student):
+    from docx import Document
+    from docx.enum.section import WD_ORIENT
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
+
+    document = Document()
+    section = document.sections[0]
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width, section.page_height = section.page_height, section.page_width
+
+    def line(text, size, bold=False):
+        paragraph = document.add_paragraph()
+        paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = paragraph.add_run(text)
+        run.bold = bold
+        run.font.size = Pt(size)
+
+    line('SERTIFIKAT PENYELESAIAN', 32, bold=True)
+    line('Dengan rasa syukur, sertifikat ini diberikan kepada', 14)
+    line(student['full_name'], 28, bold=True)
+    line('yang telah menyelesaikan kursus', 14)
+    line(course['title'], 22, bold=True)
+    line(f"pada {_date(student['completed_at'] or datetime.utcnow())}", 14)
+    line(f"Instruktur: {course['instructor']}", 12)
+
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+RENDERERS = {'report': render_progress_report, 'certificate': render_certificate}
+
+
+def _render(kind, course, assessments, student):
+    # The id keeps names unique: non-ASCII usernames can reduce to the same slug
+    slug = secure_filename(student['username'])
+    filename = '-'.join(filter(None, (str(student['user_id']), slug, kind))) + '.docx'
+    return filename, RENDERERS[kind](course, assessments, student)
+
+
+def build_archive(job_id, course_id, kind):
+    """Render every student's document and zip them; returns the document count.
+
+    Rendering is CPU-bound, so documents are spread over a process pool
+    (``DOCUMENT_WORKERS``, default CPU count); the zip is written to a
+    temporary file and renamed into place once complete.
+    """
+    course, assessments = _course_data(course_id)
+    students = list(_students(course_id, [a[0] for a in assessments], kind))
+
+    render = partial(_render, kind, course, assessments)
+    workers = current_app.config.get('DOCUMENT_WORKERS') or os.cpu_count() or 1
+    directory = export_dir()
+    os.makedirs(directory, exist_ok=True)
+    part = os.path.join(directory, f'documents-{job_id}.part')
+    try:
+        with zipfile.ZipFile(part, 'w', zipfile.ZIP_DEFLATED) as archive:
+            if workers == 1 or len(students) < 2:
+                for filename, data in map(render, students):
+                    archive.writestr(filename, data)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for filename, data in pool.map(render, students, chunksize=8):
+                        archive.writestr(filename, data)
+        os.replace(part, archive_path(job_id))
+    finally:
+        if os.path.exists(part):
+            os.unlink(part)
+    return len(students)
+
+
+@job('documents.export')
+def export_documents_job(job):
+    args = job.args
+    return {'count': build_archive(job.id, args['course_id'], args['kind'])}
+
+
+def start_export(course_id, kind, user_id):
+    """Queue a course's documents for the workers; the caller commits"""
+    return enqueue('documents.export', {'course_id': course_id, 'kind': kind}, user_id=user_id)
@@ -0,0 +1,91 @@
+from app import db
+from app.models.user import User, UserRole
+from app.models.course import Enrollment
+from app.models.progress import rebuild_progress
+from app.services.spreadsheets import ImportReport, chunked
+
+IDENTIFIER_COLUMNS = ('username', 'email', 'user')
+
+
+def _identifier(values):
+    for column in IDENTIFIER_COLUMNS:
+        if values.get(column):
+            return values[column]
+    return None
+
+
+def _lookup_users(connection, identifiers):
+    """Map each username/email (lower-cased) to ``(id, role)`` in batched queries.
+
+    Matching ignores letter case; ``lower(column) IN (...)`` is served by
+    the idx_user_*_lower expression indexes.
+    """
+    candidates = sorted({i.lower() for i in identifiers})
+    found = {}
+    users = User.__table__
+    for chunk in chunked(candidates):
+        rows = connection.execute(
+            db.select(users.c.id, users.c.username, users.c.email, users.c.role).where(db.or_(
+                db.func.lower(users.c.username).in_(chunk),
+                db.func.lower(users.c.email).in_(chunk)
+            ))
+        )
+        for user_id, username, email, role in rows:
+            found[username.lower()] = (user_id, role)
+            found[email.lower()] = (user_id, role)
+    return found
+
+
+def _insert_ignore(table):
+    """INSERT that skips rows violating a unique constraint (uq_user_course)"""
+    return table.insert().prefix_with('OR IGNORE', dialect='sqlite').prefix_with('IGNORE', dialect='mysql')
+
+
+def import_enrollments(connection, course_id, rows):
+    """Enroll the students listed in ``rows`` (from ``read_rows``) into a course.
+
+    Rows name a student by ``username`` or ``email`` (or a ``user`` column
+    holding either). Returns an ImportReport; existing enrollments are
+    skipped, unknown or non-student accounts are reported per row.
+    """
+    report = ImportReport()
+    wanted = []
+    for number, values in rows:
+        identifier = _identifier(values)
+        if identifier is None:
+            report.error(number, '', 'Kolom username/email kosong.')
+            continue
+        wanted.append((number, identifier))
+
+    users = _lookup_users(connection, {identifier for _, identifier in wanted})
+
+    user_ids = []
+    seen = set()
+    for number, identifier in wanted:
+        user = users.get(identifier.lower())
+        if user is None:
+            report.error(number, identifier, 'Pengguna tidak ditemukan.')
+        elif user[1] != UserRole.STUDENT.value:
+            report.error(number, identifier, 'Pengguna bukan siswa.')
+        elif user[0] in seen:
+            report.skipped += 1
+        else:
+            seen.add(user[0])
+            user_ids.append(user[0])
+
+    enrollments = Enrollment.__table__
+    insert = _insert_ignore(enrollments)
+    for chunk in chunked(user_ids):
+        result = connection.execute(insert.values([
+            {'user_id': user_id, 'course_id': course_id, 'status': 'active', 'progress_percentage': 0.0}
+            for user_id in chunk
+        ]))
+        report.created += result.rowcount
+        report.skipped += len(chunk) - result.rowcount
+
+    # Core inserts bypass the Enrollment mapper events that maintain
+    # course_progress, so regenerate the course's rows once at the end
+    if report.created:
+        rebuild_progress(connection, course_id=course_id)
+    report.errors.sort(key=lambda error: error['row'])
+    return report
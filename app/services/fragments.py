@@ -0,0 +1,47 @@
+from cachelib import FileSystemCache, SimpleCache
+from flask import current_app, render_template
+from markupsafe import Markup
+
+
+def get_fragment_cache(app=None):
+    """Return the app's fragment cache.
+
+    In memory per worker by default; with ``FRAGMENT_CACHE_DIR`` set it is a
+    filesystem cache that all gunicorn workers share.
+    """
+    app = app or current_app
+    cache = app.extensions.get('fragment_cache')
+    if cache is None:
+        directory = app.config.get('FRAGMENT_CACHE_DIR')
+        threshold = app.config.get('FRAGMENT_CACHE_THRESHOLD', 500)
+        if directory:
+            cache = FileSystemCache(directory, threshold=threshold)
+        else:
+            cache = SimpleCache(threshold=threshold)
+        app.extensions['fragment_cache'] = cache
+    return cache
+
+
+def version_of(obj):
+    """Cache version for a row: its last change, or its creation if never edited"""
+    stamp = obj.updated_at or obj.created_at
+    return stamp.isoformat() if stamp else '0'
+
+
+def render_fragment(key, template, context):
+    """Render ``template`` once per ``key`` and serve the HTML from cache afterwards.
+
+    ``context`` is a callable returning the template context, so the queries
+    behind the fragment only run on a cache miss. Keys carry the version of
+    the rows they depend on; edits bump ``updated_at`` and old entries simply
+    age out.
+    """
+    if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        return Markup(render_template(template, **context()))
+
+    cache = get_fragment_cache()
+    html = cache.get(key)
+    if html is None:
+        html = render_template(template, **context())
+        cache.set(key, html, timeout=current_app.config.get('FRAGMENT_CACHE_TIMEOUT', 3600))
+    return Markup(html)
@@ -0,0 +1,94 @@
+import tempfile
+from itertools import groupby
+
+from app import db
+from app.models.user import User
+from app.models.course import Enrollment
+from app.models.module import Module
+from app.models.assessment import Assessment
+from app.models.result import Result
+
+GRADEBOOK_MODES = ('best', 'latest')
+FETCH_SIZE = 1000
+
+
+def gradebook_columns(course_id):
+    """The course's assessments in module order: ``[(id, title), ...]``"""
+    return db.session.execute(
+        db.select(Assessment.id, Assessment.title)
+        .join(Module, Module.id == Assessment.module_id)
+        .where(Assessment.course_id == course_id)
+        .order_by(Module.order, Assessment.id)
+    ).all()
+
+
+def gradebook_rows(course_id, assessment_ids, mode='best'):
+    """Yield ``(full_name, username, {assessment_id: percentage})`` per enrolled student.
+
+    One query over enrollments outer-joined to graded results, ordered by
+    student, fetched ``FETCH_SIZE`` rows at a time; only the current
+    student's scores are held in memory.
+    """
+    query = (
+        db.select(User.id, User.full_name, User.username,
+                  Result.assessment_id, Result.percentage)
+        .select_from(Enrollment)
+        .join(User, User.id == Enrollment.user_id)
+        .outerjoin(Result, db.and_(
+            Result.user_id == Enrollment.user_id,
+            Result.assessment_id.in_(assessment_ids),
+            Result.percentage.isnot(None)
+        ))
+        .where(Enrollment.course_id == course_id)
+        .order_by(User.full_name, User.id, Result.assessment_id,
+                  Result.attempt_number, Result.submitted_at, Result.id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    rows = db.session.execute(query)
+    for _, student in groupby(rows, key=lambda row: row.id):
+        scores = {}
+        for row in student:
+            if row.assessment_id is None:
+                continue
+            # Attempts arrive oldest first, so "latest" keeps overwriting
+            if mode == 'latest' or row.percentage > scores.get(row.assessment_id, -1):
+                scores[row.assessment_id] = row.percentage
+        yield row.full_name, row.username, scores
+
+
+def write_gradebook(course_id, mode='best'):
+    """Build the XLSX gradebook in a temporary file and return it, rewound.
+
+    openpyxl's write-only mode spools each row to disk as it is appended,
+    so memory stays flat however many results the course has.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    columns = gradebook_columns(course_id)
+    assessment_ids = [assessment_id for assessment_id, _ in columns]
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Nilai')
+    sheet.freeze_panes = 'C2'
+    sheet.column_dimensions['A'].width = 30
+    sheet.column_dimensions['B'].width = 20
+
+    header = []
+    for title in ['Nama', 'Username'] + [title for _, title in columns] + ['Rata-rata']:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
+
+    for full_name, username, scores in gradebook_rows(course_id, assessment_ids, mode):
+        values = [scores.get(assessment_id) for assessment_id in assessment_ids]
+        present = [value for value in values if value is not None]
+        average = round(sum(present) / len(present), 2) if present else None
+        sheet.append([full_name, username] + [None if v is None else round(v, 2) for v in values] + [average])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
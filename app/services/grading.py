@@ -0,0 +1,156 @@
+import threading
+from datetime import datetime
+from typing import List, NamedTuple, Tuple, Union
+
+import msgspec
+
+
+class Question(msgspec.Struct):
+    """One entry of ``Assessment.questions``.
+
+    ``answer`` is either the index of the correct option (multiple choice)
+    or the accepted text answer(s) for a short-answer question.
+    """
+    question: str
+    answer: Union[int, str, List[str]]
+    options: List[str] = []
+    points: float = 1.0
+
+
+class CompiledQuestion(NamedTuple):
+    field: str
+    text: str
+    options: Tuple[str, ...]
+    accepted: frozenset
+    points: float
+
+
+class AnswerKey(NamedTuple):
+    questions: Tuple[CompiledQuestion, ...]
+    total_points: float
+
+
+class QuizScore(NamedTuple):
+    score: float
+    max_score: float
+    percentage: float
+    correct: int
+    total: int
+
+
+_decoder = msgspec.json.Decoder(List[Question])
+_cache = {}
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 512
+
+
+def _normalize(text):
+    return ' '.join(str(text).split()).casefold()
+
+
+def compile_questions(raw):
+    """Decode question JSON into an AnswerKey; raises ValueError when invalid"""
+    try:
+        questions = _decoder.decode(raw)
+    except msgspec.DecodeError as exc:
+        raise ValueError(f'Format soal tidak valid: {exc}') from exc
+
+    if not questions:
+        raise ValueError('Quiz harus memiliki minimal satu soal.')
+
+    compiled = []
+    for index, q in enumerate(questions):
+        if isinstance(q.answer, int):
+            if not 0 <= q.answer < len(q.options):
+                raise ValueError(f'Soal {index + 1}: indeks jawaban di luar daftar pilihan.')
+            accepted = frozenset([str(q.answer)])
+        else:
+            answers = [q.answer] if isinstance(q.answer, str) else q.answer
+            accepted = frozenset(_normalize(a) for a in answers)
+            if q.options:
+                # Multiple choice is submitted as the option index, so map
+                # the answer text onto the matching option(s)
+                indexes = {str(i) for i, option in enumerate(q.options) if _normalize(option) in accepted}
+                if not indexes:
+                    raise ValueError(f'Soal {index + 1}: jawaban tidak ada di daftar pilihan.')
+                accepted = frozenset(indexes)
+        if q.points < 0:
+            raise ValueError(f'Soal {index + 1}: poin tidak boleh negatif.')
+
+        compiled.append(CompiledQuestion(
+            field=f'answer_{index}',
+            text=q.question,
+            options=tuple(q.options),
+            accepted=accepted,
+            points=q.points
+        ))
+
+    return AnswerKey(questions=tuple(compiled), total_points=sum(q.points for q in compiled))
+
+
+def get_answer_key(assessment):
+    """Return the cached AnswerKey for a quiz, or None if it can't be auto-graded"""
+    if assessment.assessment_type != 'quiz' or not assessment.questions:
+        return None
+
+    version = (assessment.id, assessment.updated_at or assessment.created_at)
+    key = _cache.get(version)
+    if key is not None:
+        return key
+
+    try:
+        key = compile_questions(assessment.questions)
+    except ValueError:
+        return None
+
+    with _cache_lock:
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.clear()
+        _cache[version] = key
+    return key
+
+
+def score_quiz(answer_key, answers, max_score):
+    """Score submitted answers (a mapping of form field -> value) against a key"""
+    earned = 0.0
+    correct = 0
+    for q in answer_key.questions:
+        given = answers.get(q.field)
+        if given is None:
+            continue
+        given = given.strip() if q.options else _normalize(given)
+        if given in q.accepted:
+            earned += q.points
+            correct += 1
+
+    percentage = (earned / answer_key.total_points) * 100 if answer_key.total_points else 0.0
+    return QuizScore(
+        score=round(max_score * percentage / 100, 2),
+        max_score=max_score,
+        percentage=round(percentage, 2),
+        correct=correct,
+        total=len(answer_key.questions)
+    )
+
+
+def apply_quiz_score(result, quiz_score):
+    """Record an automatic grade on a Result"""
+    result.score = quiz_score.score
+    result.max_score = quiz_score.max_score
+    result.percentage = quiz_score.percentage
+    result.status = 'graded'
+    result.graded_at = datetime.utcnow()
+    result.feedback = f'Dinilai otomatis: {quiz_score.correct} dari {quiz_score.total} jawaban benar.'
+
+
+def grade_result(result, score, feedback, max_score):
+    """Record a manual grade on a Result; raises ValueError for out-of-range scores"""
+    if score is None or not 0 <= score <= max_score:
+        raise ValueError(f'Nilai harus di antara 0 dan {max_score:g}.')
+
+    result.score = score
+    result.max_score = max_score
+    result.percentage = (score / max_score) * 100 if max_score else 0.0
+    result.feedback = feedback
+    result.status = 'graded'
+    result.graded_at = datetime.utcnow()
@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy.orm import Session, object_session
+from app import db
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class UserIdentity(UserMixin):
+    """Lightweight, detached projection of a User for ``current_user``.
+
+    It carries only what request handling and templates read, so cached
+    identities never touch the session.
+    """
+    __slots__ = ('id', 'username', 'email', 'full_name', 'role', 'avatar_url', '_active')
+
+    def __init__(self, id, username, email, full_name, role, avatar_url, is_active):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.full_name = full_name
+        self.role = role
+        self.avatar_url = avatar_url
+        self._active = bool(is_active)
+
+    @property
+    def is_active(self):
+        return self._active
+
+    def is_student(self):
+        return self.role == 'student'
+
+    def is_instructor(self):
+        return self.role == 'instructor'
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def __repr__(self):
+        return f'<UserIdentity {self.username}>'
+
+
+class IdentityCache:
+    """Per-worker LRU of UserIdentity entries with a TTL.
+
+    ``generation`` is the shared invalidation counter the entries were
+    loaded under; when another worker bumps it, the whole cache is dropped.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+
+    def sync(self, generation):
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+
+    def get(self, user_id, ttl):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, loaded_at = entry
+            if time.monotonic() - loaded_at > ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity, max_size):
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic())
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_identity_cache(app=None):
+    """Return the app's identity cache (one per app, so test apps don't share)"""
+    app = app or current_app
+    return app.extensions.setdefault('identity_cache', IdentityCache())
+
+
+def generation_path(app=None):
+    app = app or current_app
+    return app.config.get('IDENTITY_GENERATION_FILE') or os.path.join(app.instance_path, 'identity.generation')
+
+
+def current_generation(path):
+    """The shared invalidation counter: the generation file's mtime, one stat() per read"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def bump_generation(path):
+    """Tell every worker sharing ``path`` to drop its cached identities"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Strictly increasing, even if two bumps land within the clock's resolution
+    stamp = max(time.time_ns(), (current_generation(path) or 0) + 1)
+    with open(path, 'a'):
+        os.utime(path, ns=(stamp, stamp))
+
+
+_PROJECTION = (User.id, User.username, User.email, User.full_name,
+               User.role, User.avatar_url, User.is_active)
+
+
+def load_identity(user_id):
+    """Return the UserIdentity for ``user_id``, or None if missing or deactivated"""
+    config = current_app.config
+    identity_cache = get_identity_cache()
+    identity_cache.sync(current_generation(generation_path()))
+    identity = identity_cache.get(user_id, config.get('IDENTITY_CACHE_TTL', 30))
+    if identity is None:
+        row = db.session.query(*_PROJECTION).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = UserIdentity(*row)
+        identity_cache.put(identity, config.get('IDENTITY_CACHE_SIZE', 1024))
+
+    # Deactivated accounts are logged out on their next request
+    return identity if identity.is_active else None
+
+
+def invalidate_identity(user_id):
+    if has_app_context():
+        get_identity_cache().invalidate(user_id)
+
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _queue_invalidation(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('identity_invalidations', set()).add(target.id)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    # Invalidate only once the change is committed, so a concurrent request
+    # can't re-cache the old row in between
+    user_ids = session.info.pop('identity_invalidations', ())
+    for user_id in user_ids:
+        invalidate_identity(user_id)
+    if user_ids and has_app_context():
+        # Other workers (and this one's other threads) see the new
+        # generation on their next lookup, instead of after the TTL
+        try:
+            bump_generation(generation_path())
+        except OSError:
+            logger.exception('Could not bump the identity cache generation')
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('identity_invalidations', None)
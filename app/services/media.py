@@ -0,0 +1,149 @@
+import mimetypes
+import os
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from flask import current_app, request, send_file
+from werkzeug.http import http_date, is_resource_modified
+from werkzeug.security import safe_join
+
+CHUNK_SIZE = 64 * 1024
+
+
+def media_root(app=None):
+    app = app or current_app
+    return app.config.get('MEDIA_ROOT') or os.path.join(app.instance_path, 'media')
+
+
+def check_media_root(app):
+    """Refuse a MEDIA_ROOT that overlaps the static folder.
+
+    Everything under static is served publicly at /static/, which would
+    bypass the enrollment check in front of module media.
+    """
+    root = os.path.realpath(media_root(app))
+    static = os.path.realpath(app.static_folder)
+    if os.path.commonpath([root, static]) in (root, static):
+        raise RuntimeError(f'MEDIA_ROOT ({root}) must not overlap the static folder ({static})')
+
+
+def resolve_media_path(file_url):
+    """Map a stored media URL (``/static/audio/x.mp3``) to a file under MEDIA_ROOT.
+
+    The ``/static/`` prefix of older URLs is only a naming convention: the
+    file is looked up under MEDIA_ROOT, never in the public static folder.
+
+    Returns ``(relative_path, absolute_path)``, or None for external URLs
+    and paths that escape the media root or don't exist.
+    """
+    if not file_url or '://' in file_url or file_url.startswith('//'):
+        return None
+    relative = file_url
+    static_prefix = (current_app.static_url_path or '/static') + '/'
+    if relative.startswith(static_prefix):
+        relative = relative[len(static_prefix):]
+    relative = relative.lstrip('/')
+    path = safe_join(media_root(), relative)
+    if path is None or not os.path.isfile(path):
+        return None
+    return relative, path
+
+
+def is_local_media(file_url):
+    return resolve_media_path(file_url) is not None
+
+
+def _read_range(f, length):
+    try:
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _if_range_matches(etag, mtime):
+    """False when If-Range names an older copy, so the full file must be sent"""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return mtime <= if_range.date
+    return True
+
+
+def send_media(relative, path, accel_prefix=None, download_name=None):
+    """Serve a media file with Range support.
+
+    ``relative`` is the path below the root that ``accel_prefix`` maps to
+    (MEDIA_X_ACCEL_PREFIX by default); ``download_name`` makes it an
+    attachment. With an X-Accel prefix (nginx) or ``USE_X_SENDFILE`` (Apache,
+    lighttpd) the front server sends the bytes and handles Range itself.
+    Otherwise the requested byte range is streamed through the server's
+    ``wsgi.file_wrapper`` (gunicorn turns that into ``sendfile(2)``), or in
+    chunks when there is none.
+    """
+    config = current_app.config
+    mimetype = mimetypes.guess_type(download_name or path)[0] or 'application/octet-stream'
+    max_age = config.get('MEDIA_MAX_AGE', 3600)
+    if accel_prefix is None:
+        accel_prefix = config.get('MEDIA_X_ACCEL_PREFIX')
+
+    if accel_prefix:
+        response = current_app.response_class(mimetype=mimetype)
+        # nginx decodes the URI, so spaces, '%', '?' and non-ASCII names must be quoted
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(relative)
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+    elif config.get('USE_X_SENDFILE'):
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=max_age)
+        response.cache_control.private = True
+    else:
+        response = _stream_file(path, mimetype, max_age)
+
+    if download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
+
+
+def _stream_file(path, mimetype, max_age):
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'{stat.st_mtime_ns:x}-{size:x}'
+    mtime = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': f'private, max-age={max_age}'
+    }
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=mtime):
+        return current_app.response_class(status=304, headers=headers)
+
+    start, stop, status = 0, size, 200
+    # Only a single range is honoured; If-Range falls back to the full file
+    # when the client's copy is outdated
+    byte_range = request.range
+    if byte_range is not None and len(byte_range.ranges) == 1 and _if_range_matches(etag, mtime):
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{size}'
+            return current_app.response_class(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    length = stop - start
+    f = open(path, 'rb')
+    f.seek(start)
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    # The server's file wrapper sends Content-Length bytes from the current offset
+    body = file_wrapper(f, CHUNK_SIZE) if file_wrapper else _read_range(f, length)
+    response = current_app.response_class(body, status=status, headers=headers,
+                                          mimetype=mimetype, direct_passthrough=True)
+    response.content_length = length
+    return response
@@ -0,0 +1,156 @@
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug.security import generate_password_hash
+from app import db
+from app.jobs import enqueue, job
+from app.models.user import User, UserRole
+from app.services.spreadsheets import ImportReport, SpreadsheetError, chunked, read_rows
+from app.services.stats import invalidate_admin_stats
+
+PROVISION_ROLES = (UserRole.STUDENT.value, UserRole.INSTRUCTOR.value)
+MIN_PASSWORD_LENGTH = 6
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash passwords across a process pool.
+
+    Werkzeug's hash is deliberately slow and CPU-bound, so throughput scales
+    with the number of worker processes.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2 * workers:
+        return [generate_password_hash(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def _validate(number, values, report):
+    username, email = values.get('username'), values.get('email')
+    full_name, password = values.get('full_name') or values.get('nama'), values.get('password')
+    role = (values.get('role') or UserRole.STUDENT.value).lower()
+    if not (username and email and full_name and password):
+        report.error(number, username or email or '', 'Kolom username, email, full_name dan password wajib diisi.')
+    elif len(password) < MIN_PASSWORD_LENGTH:
+        report.error(number, username, f'Password minimal {MIN_PASSWORD_LENGTH} karakter.')
+    elif role not in PROVISION_ROLES:
+        report.error(number, username, f'Role tidak dikenal: {role}.')
+    else:
+        return {'username': username, 'email': email, 'full_name': full_name, 'role': role, 'password': password}
+    return None
+
+
+def _existing(connection, usernames, emails):
+    """Usernames and emails (lower-cased) already taken, in any letter case.
+
+    ``lower(column) IN (...)`` is served by the idx_user_*_lower expression
+    indexes.
+    """
+    users = User.__table__
+    taken = set()
+    for chunk in chunked(sorted(usernames | emails)):
+        rows = connection.execute(
+            db.select(users.c.username, users.c.email).where(db.or_(
+                db.func.lower(users.c.username).in_(chunk),
+                db.func.lower(users.c.email).in_(chunk)
+            ))
+        )
+        for username, email in rows:
+            taken.add(username.lower())
+            taken.add(email.lower())
+    return taken
+
+
+def provision_users(connection, rows, workers=None):
+    """Create the accounts listed in ``rows`` (from ``read_rows``).
+
+    Columns: ``username``, ``email``, ``full_name``, ``password`` and an
+    optional ``role`` (student or instructor). Rows clashing with existing
+    accounts or earlier rows are reported, not inserted.
+    """
+    report = ImportReport()
+    accepted = []
+    seen = set()
+    for number, values in rows:
+        user = _validate(number, values, report)
+        if user is None:
+            continue
+        keys = (user['username'].lower(), user['email'].lower())
+        if seen.intersection(keys):
+            report.error(number, user['username'], 'Username atau email ganda di dalam file.')
+            continue
+        seen.update(keys)
+        accepted.append((number, user))
+
+    taken = _existing(connection,
+                      {u['username'].lower() for _, u in accepted},
+                      {u['email'].lower() for _, u in accepted})
+    new_users = []
+    for number, user in accepted:
+        if user['username'].lower() in taken or user['email'].lower() in taken:
+            report.error(number, user['username'], 'Username atau email sudah terdaftar.')
+        else:
+            new_users.append(user)
+
+    hashes = hash_passwords([u.pop('password') for u in new_users], workers)
+    for user, password_hash in zip(new_users, hashes):
+        user['password_hash'] = password_hash
+        user['is_active'] = True
+
+    insert = User.__table__.insert()
+    for chunk in chunked(new_users):
+        connection.execute(insert.values(chunk))
+        report.created += len(chunk)
+
+    report.errors.sort(key=lambda error: error['row'])
+    return report
+
+
+def import_dir(app=None):
+    app = app or current_app
+    return app.config.get('USER_IMPORT_DIR') or os.path.join(app.instance_path, 'imports')
+
+
+def _discard(path):
+    # The file holds plain-text passwords: don't keep it around
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+@job('users.import')
+def import_users_job(job):
+    """Provision the accounts in an uploaded file, then delete the file"""
+    args = job.args
+    path = os.path.join(import_dir(), args['file'])
+    try:
+        with open(path, 'rb') as stream:
+            report = provision_users(db.session.connection(), read_rows(stream, args['filename']),
+                                     workers=current_app.config.get('PASSWORD_HASH_WORKERS'))
+        db.session.commit()
+        # Core inserts skip the User mapper events that refresh the snapshot
+        invalidate_admin_stats()
+    except SpreadsheetError as e:
+        # A malformed file won't get better on retry
+        db.session.rollback()
+        report = ImportReport()
+        report.error(0, args['filename'], str(e))
+    except Exception:
+        # Kept for the retry, unless this was the last attempt
+        if job.attempts >= job.max_attempts:
+            _discard(path)
+        raise
+    _discard(path)
+    return report.to_dict()
+
+
+def start_import(upload, user_id):
+    """Save an uploaded user list and queue it for the workers; the caller commits"""
+    extension = os.path.splitext(upload.filename)[1].lower()
+    name = uuid.uuid4().hex + extension
+    directory = import_dir()
+    os.makedirs(directory, exist_ok=True)
+    upload.save(os.path.join(directory, name))
+    return enqueue('users.import', {'file': name, 'filename': upload.filename}, user_id=user_id)
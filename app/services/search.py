@@ -0,0 +1,291 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+from markupsafe import Markup, escape
+from app import db
+from app.models.course import Course
+from app.models.module import Module
+
+# Arabic harakat, Quranic annotation marks, superscript alef and tatweel
+_ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06dc\u06df-\u06e8\u06ea-\u06ed\u0640]')
+_ARABIC_LETTERS = str.maketrans({
+    '\u0623': '\u0627',  # alef with hamza above -> alef
+    '\u0625': '\u0627',  # alef with hamza below -> alef
+    '\u0622': '\u0627',  # alef with madda -> alef
+    '\u0671': '\u0627',  # alef wasla -> alef
+    '\u0649': '\u064a',  # alef maksura -> ya
+    '\u0629': '\u0647',  # ta marbuta -> ha
+})
+_WHITESPACE = re.compile(r'\s+')
+_TERM = re.compile(r'\w+')
+
+# Highlight markers for snippet(); control characters can't occur in indexed text
+_MARK_START, _MARK_END = '\x02', '\x03'
+MAX_QUERY_TERMS = 10
+
+# unicode61 with remove_diacritics folds Latin accents and case; Arabic is
+# normalized in Python (normalize_text) because its combining marks would
+# otherwise split words
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE search_index USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, course_id UNINDEXED, title, body, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def strip_html(html):
+    """Visible text of an HTML fragment"""
+    if not html:
+        return ''
+    if '<' not in html:
+        return unescape(html)
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ' '.join(extractor.parts)
+
+
+def normalize_text(text):
+    """Fold Arabic spelling variants so vocalized and plain text match"""
+    text = _ARABIC_MARKS.sub('', text or '').translate(_ARABIC_LETTERS)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def build_match_query(text):
+    """Turn free user input into a safe FTS5 query: every term, prefix-matched"""
+    terms = _TERM.findall(normalize_text(text))[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_available(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def _rowid(kind, ref_id):
+    # Fixed rowids make re-indexing one row a rowid lookup; FTS5 would
+    # have to scan to match on UNINDEXED columns
+    return ref_id * 2 + (1 if kind == 'module' else 0)
+
+
+def _course_entry(id, title, description):
+    return {'rowid': _rowid('course', id), 'kind': 'course', 'ref_id': id, 'course_id': id,
+            'title': normalize_text(title), 'body': normalize_text(strip_html(description))}
+
+
+def _module_entry(id, course_id, title, description, content):
+    body = ' '.join(filter(None, (strip_html(description), strip_html(content))))
+    return {'rowid': _rowid('module', id), 'kind': 'module', 'ref_id': id, 'course_id': course_id,
+            'title': normalize_text(title), 'body': normalize_text(body)}
+
+
+_DELETE = db.text('DELETE FROM search_index WHERE rowid = :rowid')
+_INSERT = db.text(
+    'INSERT INTO search_index (rowid, kind, ref_id, course_id, title, body) '
+    'VALUES (:rowid, :kind, :ref_id, :course_id, :title, :body)'
+)
+
+
+def rebuild_search_index(connection, batch_size=500):
+    """Re-index every course and module; returns the number of entries"""
+    connection.execute(db.text('DELETE FROM search_index'))
+    count = 0
+    batch = []
+    courses = connection.execute(
+        db.select(Course.id, Course.title, Course.description)
+    )
+    modules = connection.execution_options(yield_per=batch_size).execute(
+        db.select(Module.id, Module.course_id, Module.title, Module.description, Module.content)
+    )
+    entries = [_course_entry(*row) for row in courses]
+    for source in (entries, (_module_entry(*row) for row in modules)):
+        for entry in source:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                connection.execute(_INSERT, batch)
+                count += len(batch)
+                batch = []
+    if batch:
+        connection.execute(_INSERT, batch)
+        count += len(batch)
+    connection.execute(db.text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+    return count
+
+
+def _highlight(excerpt):
+    return Markup(str(escape(excerpt or '')).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def _fallback_snippet(text, terms, width=120):
+    """Plain-Python stand-in for FTS5's snippet(): a window around the first hit"""
+    text = _WHITESPACE.sub(' ', text).strip()
+    lowered = text.lower()
+    hits = [position for position in (lowered.find(term.lower()) for term in terms) if position >= 0]
+    if not hits:
+        return Markup('')
+    start = max(0, min(hits) - width // 4)
+    excerpt = text[start:start + width]
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    excerpt = pattern.sub(lambda m: _MARK_START + m.group() + _MARK_END, excerpt)
+    return _highlight(('…' if start else '') + excerpt + ('…' if start + width < len(text) else ''))
+
+
+def _fallback_search(query, limit):
+    """Backends without FTS5: the fields the index covers, matched with ILIKE.
+
+    Every term must occur (as a substring, case-insensitively) in one of
+    the fields; hits with all terms in the title come first. There is no
+    Arabic normalization or bm25 ranking, and each query scans the tables.
+    """
+    terms = _TERM.findall(query)[:MAX_QUERY_TERMS]
+
+    def matching(*columns):
+        return db.and_(*(db.or_(*(column.icontains(term, autoescape=True) for column in columns))
+                         for term in terms))
+
+    def title_rank(column):
+        return db.case((db.and_(*(column.icontains(term, autoescape=True) for term in terms)), 0), else_=1)
+
+    courses = db.session.execute(
+        db.select(Course.id, Course.title, Course.description, title_rank(Course.title).label('rank'))
+        .where(Course.status == 'published', matching(Course.title, Course.description))
+        .order_by('rank', Course.id)
+        .limit(limit)
+    )
+    modules = db.session.execute(
+        db.select(Module.id, Module.course_id, Course.title.label('course_title'), Module.title,
+                  Module.description, Module.content, title_rank(Module.title).label('rank'))
+        .join(Course, Course.id == Module.course_id)
+        .where(Course.status == 'published', Module.status == 'published',
+               matching(Module.title, Module.description, Module.content))
+        .order_by('rank', Module.id)
+        .limit(limit)
+    )
+
+    results = [(row.rank, {'kind': 'course', 'id': row.id, 'course_id': row.id, 'course_title': row.title,
+                           'title': row.title, 'snippet': _fallback_snippet(strip_html(row.description), terms)})
+               for row in courses]
+    for row in modules:
+        body = ' '.join(filter(None, (strip_html(row.description), strip_html(row.content))))
+        results.append((row.rank, {'kind': 'module', 'id': row.id, 'course_id': row.course_id,
+                                   'course_title': row.course_title, 'title': row.title,
+                                   'snippet': _fallback_snippet(body, terms)}))
+    results.sort(key=lambda item: item[0])
+    return [result for _, result in results[:limit]]
+
+
+def search(query, limit=20):
+    """Published courses and modules matching ``query``, best match first"""
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    connection = db.session.connection()
+    if not search_available(connection):
+        return _fallback_search(query, limit)
+
+    rows = db.session.execute(db.text(
+        "SELECT s.kind, s.ref_id, s.course_id, c.title AS course_title, "
+        "COALESCE(m.title, c.title) AS title, "
+        "snippet(search_index, 4, char(2), char(3), '…', 16) AS excerpt "
+        "FROM search_index s "
+        "JOIN courses c ON c.id = s.course_id "
+        "LEFT JOIN modules m ON s.kind = 'module' AND m.id = s.ref_id "
+        "WHERE search_index MATCH :match AND c.status = 'published' "
+        "AND (s.kind = 'course' OR m.status = 'published') "
+        "ORDER BY bm25(search_index, 0.0, 0.0, 0.0, 10.0, 1.0) "
+        "LIMIT :limit"
+    ), {'match': match, 'limit': limit})
+
+    return [{'kind': row.kind, 'id': row.ref_id, 'course_id': row.course_id,
+             'course_title': row.course_title, 'title': row.title,
+             'snippet': _highlight(row.excerpt)} for row in rows]
+
+
+@db.event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    if not search_available(connection):
+        return
+    exists = connection.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    )).first()
+    if not exists:
+        connection.execute(db.text(CREATE_INDEX))
+        rebuild_search_index(connection)
+
+
+def _changed(target, *names):
+    state = db.inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def _reindex(connection, entry):
+    connection.execute(_DELETE, {'rowid': entry['rowid']})
+    connection.execute(_INSERT, entry)
+
+
+def _index_course(connection, course_id):
+    row = connection.execute(
+        db.select(Course.id, Course.title, Course.description).where(Course.id == course_id)
+    ).first()
+    _reindex(connection, _course_entry(*row))
+
+
+def _index_module(connection, module_id):
+    # Read the row back rather than touching attributes that may be deferred
+    row = connection.execute(
+        db.select(Module.id, Module.course_id, Module.title, Module.description, Module.content)
+        .where(Module.id == module_id)
+    ).first()
+    _reindex(connection, _module_entry(*row))
+
+
+@db.event.listens_for(Course, 'after_insert')
+def _course_inserted(mapper, connection, target):
+    if search_available(connection):
+        _index_course(connection, target.id)
+
+
+@db.event.listens_for(Course, 'after_update')
+def _course_updated(mapper, connection, target):
+    if search_available(connection) and _changed(target, 'title', 'description'):
+        _index_course(connection, target.id)
+
+
+@db.event.listens_for(Module, 'after_insert')
+def _module_inserted(mapper, connection, target):
+    if search_available(connection):
+        _index_module(connection, target.id)
+
+
+@db.event.listens_for(Module, 'after_update')
+def _module_updated(mapper, connection, target):
+    if search_available(connection) and _changed(target, 'course_id', 'title', 'description', 'content'):
+        _index_module(connection, target.id)
+
+
+@db.event.listens_for(Course, 'after_delete')
+@db.event.listens_for(Module, 'after_delete')
+def _unindex(mapper, connection, target):
+    if search_available(connection):
+        kind = 'course' if isinstance(target, Course) else 'module'
+        connection.execute(_DELETE, {'rowid': _rowid(kind, target.id)})
@@ -0,0 +1,273 @@
+import bisect
+import itertools
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models.user import User
+from app.models.course import Course, Enrollment
+from app.models.module import Module
+from app.models.assessment import Assessment
+from app.models.result import Result
+from app.models.progress import rebuild_progress
+from app.services.search import rebuild_search_index, search_available
+from app.services.stats import invalidate_admin_stats
+
+# Presets for ``flask seed --scale``; each value can be overridden per option.
+# Enrollments and modules are sized so the courses can hold the results.
+SCALES = {
+    'small': {'users': 1_000, 'courses': 50, 'results': 20_000,
+              'enrollments_per_user': 5.0, 'modules_per_course': 8},
+    'medium': {'users': 100_000, 'courses': 1_000, 'results': 2_000_000,
+               'enrollments_per_user': 5.0, 'modules_per_course': 8},
+    'large': {'users': 1_000_000, 'courses': 10_000, 'results': 50_000_000,
+              'enrollments_per_user': 8.0, 'modules_per_course': 10},
+}
+
+# Generated timestamps are spread over two years from a fixed start so the
+# same seed always produces the same rows
+SEED_EPOCH = datetime(2024, 1, 1)
+SEED_SPAN_DAYS = 730
+SEED_PASSWORD = 'password123'
+ROWS_PER_TRANSACTION = 500_000
+
+CATEGORIES = ('Keagamaan', 'Bahasa Arab', 'Tahfidz', 'Fiqih', 'Sirah', 'Akhlak', 'Tajwid', 'Hadits')
+LEVELS = ('beginner', 'intermediate', 'advanced')
+ASSESSMENT_TYPES = ('quiz', 'assignment', 'submission')
+FIRST_NAMES = ('Ahmad', 'Muhammad', 'Siti', 'Nur', 'Dina', 'Budi', 'Aisyah', 'Fatimah', 'Umar', 'Ali',
+               'Khadijah', 'Hasan', 'Husain', 'Zainab', 'Yusuf', 'Maryam', 'Ibrahim', 'Rahmat', 'Dewi', 'Rizki')
+LAST_NAMES = ('Rahman', 'Santoso', 'Wijaya', 'Hidayat', 'Nurhaliza', 'Saputra', 'Lestari', 'Kurniawan',
+              'Hakim', 'Fauzi', 'Syahputra', 'Maulana', 'Pratama', 'Ramadhan', 'Utami', 'Hasanah')
+
+# Secondary indexes rebuilt after loading instead of maintained row by row
+# (which also creates any that an older database is missing). Unique
+# indexes stay in place: they are what guarantees correctness.
+BULK_TABLES = (User.__table__, Module.__table__, Enrollment.__table__, Result.__table__)
+
+
+class _Loader:
+    """Buffers rows per table and writes them with executemany in large transactions"""
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+        self._since_commit = 0
+        self._transaction = connection.begin()
+
+    def add(self, table, row):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table):
+        buffer = self.buffers.get(table)
+        if not buffer:
+            return
+        self.connection.execute(table.insert(), buffer)
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(buffer)
+        self._since_commit += len(buffer)
+        self.buffers[table] = []
+        if self._since_commit >= ROWS_PER_TRANSACTION:
+            self._transaction.commit()
+            self._transaction = self.connection.begin()
+            self._since_commit = 0
+
+    def finish(self):
+        # Parents before children, in case foreign keys are enforced
+        for table in [t for t in db.metadata.sorted_tables if t in self.buffers]:
+            self.flush(table)
+        self._transaction.commit()
+        return self.counts
+
+
+def _next_id(connection, table):
+    return (connection.execute(db.select(db.func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _moment(rng, after=None):
+    start = after or SEED_EPOCH
+    end = SEED_EPOCH + timedelta(days=SEED_SPAN_DAYS)
+    return start + (end - start) * rng.random()
+
+
+def _person(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def _bulk_settings(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        # Affects this connection only; a crash mid-seed means re-seeding anyway
+        connection.exec_driver_sql('PRAGMA synchronous=OFF')
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+    elif dialect == 'mysql':
+        connection.exec_driver_sql('SET SESSION foreign_key_checks=0')
+        connection.exec_driver_sql('SET SESSION unique_checks=0')
+
+
+def _analyze(connection):
+    # Fresh planner statistics; without them SQLite picks the status index
+    # for the per-student counts in rebuild_progress and scans every result
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('ANALYZE')
+    elif connection.dialect.name == 'mysql':
+        connection.exec_driver_sql('ANALYZE TABLE ' + ', '.join(t.name for t in BULK_TABLES))
+
+
+def _secondary_indexes():
+    return [index for table in BULK_TABLES for index in table.indexes if not index.unique]
+
+
+def seed_database(engine, users, courses, results, instructor_ratio=0.01,
+                  modules_per_course=6, enrollments_per_user=4.0, popularity_skew=1.1,
+                  seed=42, batch_size=10_000, echo=None):
+    """Generate a synthetic platform of the given size; returns row counts per table.
+
+    The same ``seed`` and options always produce the same rows. Course
+    popularity follows a Zipf distribution (``popularity_skew``), enrollments
+    per student and modules per course are exponential around their means,
+    and ``results`` is spread over the enrollments so the total lands close
+    to the target (less if the courses have too few assessment attempts to
+    hold that many). Rows are appended after any existing data.
+    """
+    echo = echo or (lambda message: None)
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    users_table, courses_table, modules_table = User.__table__, Course.__table__, Module.__table__
+    assessments_table, enrollments_table, results_table = Assessment.__table__, Enrollment.__table__, Result.__table__
+
+    with engine.connect() as connection:
+        _bulk_settings(connection)
+        first = {table.name: _next_id(connection, table) for table in (
+            users_table, courses_table, modules_table, assessments_table, enrollments_table, results_table)}
+        connection.commit()
+
+        indexes = _secondary_indexes()
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        connection.commit()
+
+        loader = _Loader(connection, batch_size)
+
+        echo(f'Users: {users}')
+        instructor_count = max(1, int(users * instructor_ratio))
+        user_ids = range(first['users'], first['users'] + users)
+        instructor_ids = user_ids[:instructor_count]
+        for user_id in user_ids:
+            role = 'instructor' if user_id in instructor_ids else 'student'
+            loader.add(users_table, {
+                'id': user_id, 'username': f'seed{user_id}', 'email': f'seed{user_id}@example.com',
+                'password_hash': password_hash, 'full_name': _person(rng), 'role': role,
+                'is_active': True, 'created_at': _moment(rng)
+            })
+
+        echo(f'Courses: {courses}')
+        module_id, assessment_id = first['modules'], first['assessments']
+        # Per course, the (assessment, attempt) pairs a student can have a result
+        # for: every first attempt, then retries where they are allowed
+        course_attempts = []
+        for course_id in range(first['courses'], first['courses'] + courses):
+            created_at = _moment(rng)
+            loader.add(courses_table, {
+                'id': course_id, 'title': f'{rng.choice(CATEGORIES)} {course_id}',
+                'description': f'Kursus sintetis nomor {course_id}.',
+                'instructor_id': rng.choice(instructor_ids),
+                'status': 'published' if rng.random() < 0.9 else rng.choice(('draft', 'archived')),
+                'category': rng.choice(CATEGORIES), 'level': rng.choice(LEVELS),
+                'duration_weeks': rng.randint(2, 16), 'created_at': created_at
+            })
+            assessments, retries = [], []
+            for order in range(1, max(1, round(rng.expovariate(1 / modules_per_course))) + 1):
+                loader.add(modules_table, {
+                    'id': module_id, 'course_id': course_id, 'title': f'Materi {order}',
+                    'description': f'Materi {order} kursus {course_id}.',
+                    'content': f'<p>Isi materi {order} kursus {course_id}.</p>',
+                    'order': order, 'status': 'published', 'duration_minutes': rng.randint(5, 60),
+                    'created_at': created_at
+                })
+                if rng.random() < 0.6:
+                    multiple = rng.random() < 0.3
+                    loader.add(assessments_table, {
+                        'id': assessment_id, 'module_id': module_id, 'course_id': course_id,
+                        'title': f'Penilaian {order}', 'assessment_type': rng.choice(ASSESSMENT_TYPES),
+                        'max_score': 100.0, 'is_graded': True, 'allow_multiple_attempts': multiple,
+                        'status': 'published', 'created_at': created_at
+                    })
+                    assessments.append((assessment_id, 1))
+                    if multiple:
+                        retries.extend([(assessment_id, 2), (assessment_id, 3)])
+                    assessment_id += 1
+                module_id += 1
+            course_attempts.append(assessments + retries)
+
+        # Zipf popularity over a shuffled course order: a few courses are huge
+        popularity = list(range(courses))
+        rng.shuffle(popularity)
+        weights = [0.0] * courses
+        for rank, index in enumerate(popularity):
+            weights[index] = 1 / (rank + 1) ** popularity_skew
+        cumulative = list(itertools.accumulate(weights))
+        total_weight = cumulative[-1]
+
+        echo(f'Enrollments and about {results} results')
+        students = users - instructor_count
+        remaining = results
+        enrollment_id, result_id = first['enrollments'], first['results']
+        for position, user_id in enumerate(user_ids[instructor_count:]):
+            wanted = min(courses, max(1, round(rng.expovariate(1 / enrollments_per_user))))
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.add(bisect.bisect(cumulative, rng.random() * total_weight))
+            # Results still owed, shared over the enrollments still to come
+            per_enrollment = remaining / max(1.0, (students - position) * enrollments_per_user)
+            for index in sorted(chosen):
+                enrolled_at = _moment(rng)
+                roll = rng.random()
+                status = 'completed' if roll < 0.15 else 'dropped' if roll < 0.2 else 'active'
+                loader.add(enrollments_table, {
+                    'id': enrollment_id, 'user_id': user_id, 'course_id': first['courses'] + index,
+                    'enrolled_at': enrolled_at, 'status': status, 'progress_percentage': 0.0,
+                    'completed_at': _moment(rng, enrolled_at) if status == 'completed' else None
+                })
+                enrollment_id += 1
+
+                attempts = course_attempts[index]
+                count = int(per_enrollment) + (rng.random() < per_enrollment % 1)
+                count = min(count, remaining, len(attempts))
+                for assessment, attempt_number in attempts[:count]:
+                    submitted_at = _moment(rng, enrolled_at)
+                    graded = rng.random() < 0.85
+                    percentage = round(rng.betavariate(5, 2) * 100, 1) if graded else None
+                    loader.add(results_table, {
+                        'id': result_id, 'user_id': user_id,
+                        'assessment_id': assessment, 'attempt_number': attempt_number,
+                        'score': percentage, 'max_score': 100.0, 'percentage': percentage,
+                        'status': 'graded' if graded else 'submitted',
+                        'submitted_at': submitted_at,
+                        'graded_at': _moment(rng, submitted_at) if graded else None
+                    })
+                    result_id += 1
+                remaining -= count
+
+        counts = loader.finish()
+
+        echo('Rebuilding indexes')
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+        _analyze(connection)
+        connection.commit()
+
+        # Core inserts bypass the mapper events behind these derived tables
+        echo('Rebuilding course progress')
+        rebuild_progress(connection)
+        if search_available(connection):
+            echo('Rebuilding search index')
+            rebuild_search_index(connection)
+        connection.commit()
+
+    invalidate_admin_stats()
+    return counts
@@ -0,0 +1,100 @@
+import codecs
+import csv
+import os
+from zipfile import BadZipFile
+
+SPREADSHEET_EXTENSIONS = ('csv', 'xlsx')
+
+# Rows per IN (...) lookup and per multi-row INSERT; well below SQLite's
+# bound-parameter limit
+BATCH_SIZE = 500
+
+
+class SpreadsheetError(ValueError):
+    pass
+
+
+class ImportReport:
+    """Outcome of a bulk import: counters plus one entry per rejected row"""
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def error(self, row, value, message):
+        self.errors.append({'row': row, 'value': value, 'message': message})
+
+    def to_dict(self):
+        return {'created': self.created, 'skipped': self.skipped, 'errors': self.errors}
+
+
+def chunked(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _clean(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _rows_to_dicts(rows):
+    """Use the first non-empty row as (lower-cased) headers; skip blank rows"""
+    headers = None
+    for number, row in rows:
+        values = [_clean(v) for v in row]
+        if not any(values):
+            continue
+        if headers is None:
+            headers = [(v or '').lower() for v in values]
+            continue
+        yield number, dict(zip(headers, values))
+    if headers is None:
+        raise SpreadsheetError('File kosong atau tidak memiliki baris judul kolom.')
+
+
+def _csv_rows(stream):
+    # Decoded line by line; the file is never read into memory whole
+    reader = csv.reader(codecs.iterdecode(stream, 'utf-8-sig'))
+    return ((reader.line_num, row) for row in reader)
+
+
+def _xlsx_rows(stream):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # read_only streams the sheet XML instead of building the whole workbook
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError):
+        raise SpreadsheetError('File XLSX tidak valid.')
+    try:
+        sheet = workbook.worksheets[0]
+        for number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            yield number, row
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Yield ``(row_number, {column: value})`` from a CSV or XLSX upload.
+
+    Column names come from the header row, lower-cased; values are stripped
+    strings or None.
+    """
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension == 'csv':
+        rows = _csv_rows(stream)
+    elif extension == 'xlsx':
+        rows = _xlsx_rows(stream)
+    else:
+        raise SpreadsheetError('Format file harus CSV atau XLSX.')
+    try:
+        yield from _rows_to_dicts(rows)
+    except UnicodeDecodeError:
+        raise SpreadsheetError('File CSV harus berenkoding UTF-8.')
@@ -0,0 +1,111 @@
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.models.user import User
+from app.models.course import Course, Enrollment
+from app.models.assessment import Assessment
+from app.models.result import Result
+from app.services.fragments import get_fragment_cache
+
+ADMIN_STATS_KEY = 'admin:stats'
+_admin_lock = threading.Lock()
+
+
+def _compute_admin_stats():
+    """Build the admin dashboard counters with grouped COUNT queries"""
+    users_by_role = dict(
+        db.session.query(User.role, db.func.count(User.id)).group_by(User.role).all()
+    )
+    courses_by_status = dict(
+        db.session.query(Course.status, db.func.count(Course.id)).group_by(Course.status).all()
+    )
+
+    return {
+        'total_users': sum(users_by_role.values()),
+        'total_students': users_by_role.get('student', 0),
+        'total_instructors': users_by_role.get('instructor', 0),
+        'total_courses': sum(courses_by_status.values()),
+        'published_courses': courses_by_status.get('published', 0)
+    }
+
+
+def get_admin_stats():
+    """Return the cached admin stats snapshot, refreshing it when expired.
+
+    Kept in the app's fragment cache, so with ``FRAGMENT_CACHE_DIR`` set all
+    workers share one snapshot and one invalidation.
+    """
+    cache = get_fragment_cache()
+    stats = cache.get(ADMIN_STATS_KEY)
+    if stats is not None:
+        return stats
+
+    with _admin_lock:
+        # Another thread may have refreshed while we were waiting
+        stats = cache.get(ADMIN_STATS_KEY)
+        if stats is None:
+            stats = _compute_admin_stats()
+            cache.set(ADMIN_STATS_KEY, stats, timeout=current_app.config.get('ADMIN_STATS_TTL', 60))
+        return stats
+
+
+def get_instructor_stats(instructor_id):
+    """Return the instructor dashboard counters in a single round trip"""
+    def count(column, *criteria, distinct=False):
+        expr = db.func.count(db.distinct(column)) if distinct else db.func.count(column)
+        query = db.select(expr)
+        for criterion in criteria:
+            query = query.where(criterion)
+        return query.scalar_subquery()
+
+    owned = Course.instructor_id == instructor_id
+    row = db.session.execute(db.select(
+        count(Course.id, owned).label('total_courses'),
+        count(Course.id, owned, Course.status == 'published').label('published_courses'),
+        count(Enrollment.user_id, Enrollment.course_id == Course.id, owned,
+              distinct=True).label('total_students'),
+        count(Result.id, Result.assessment_id == Assessment.id, Assessment.course_id == Course.id,
+              owned, Result.status == 'submitted').label('pending_reviews')
+    )).one()
+
+    return dict(row._mapping)
+
+
+def get_instructor_courses(instructor_id):
+    """List an instructor's courses with student and module counts as SQL columns"""
+    return Course.query.options(
+        db.undefer(Course.enrollment_count), db.undefer(Course.module_count)
+    ).filter(Course.instructor_id == instructor_id).order_by(Course.created_at.desc()).all()
+
+
+def invalidate_admin_stats():
+    """Drop the snapshot so the next dashboard load recomputes it; call after committing"""
+    if has_app_context():
+        get_fragment_cache().delete(ADMIN_STATS_KEY)
+
+
+def _queue_invalidation(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['admin_stats_stale'] = True
+
+
+for _model in (User, Course):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        db.event.listen(_model, _event, _queue_invalidation)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _apply_invalidation(session):
+    # Only once committed: a rolled-back flush leaves the snapshot alone, and
+    # a concurrent request can't re-cache the rows before they are visible
+    if session.info.pop('admin_stats_stale', False):
+        invalidate_admin_stats()
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_invalidation(session):
+    session.info.pop('admin_stats_stale', None)
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+
+class HashingFile:
+    """Upload spool that hashes and size-checks the bytes as they arrive.
+
+    Werkzeug writes each multipart file part into it chunk by chunk, so the
+    upload goes straight to disk in the upload directory; ``store_upload``
+    then only has to rename it into place.
+    """
+
+    def __init__(self, directory, max_bytes):
+        os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', suffix='.part', delete=False)
+        self.path = self._file.name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            # The parser drops this spool when we raise; don't leave it behind
+            self.close()
+            raise RequestEntityTooLarge()
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def close(self):
+        self._file.close()
+        # Left-over spool (upload rejected, or deduplicated): remove it
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class UploadRequest(Request):
+    """Request whose file uploads are spooled through HashingFile"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(upload_dir(), current_app.config.get('UPLOAD_MAX_BYTES'))
+
+
+def upload_dir(app=None):
+    app = app or current_app
+    return app.config.get('UPLOAD_DIR') or os.path.join(app.instance_path, 'uploads')
+
+
+def blob_path(digest):
+    """Content-addressed location of a stored upload"""
+    return os.path.join(upload_dir(), digest[:2], digest)
+
+
+def allowed_upload(filename):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return extension in current_app.config.get('UPLOAD_ALLOWED_EXTENSIONS', ())
+
+
+def store_upload(file_storage):
+    """Move an uploaded file into the content-addressed store.
+
+    Returns the URL to record on the row, ``/uploads/<sha256>/<filename>``.
+    Identical bytes are stored once; the rename into place is atomic, so a
+    blob path either holds the complete file or does not exist.
+    """
+    stream = file_storage.stream
+    if not isinstance(stream, HashingFile):
+        # Not spooled by UploadRequest (e.g. a file passed in by a script)
+        spool = HashingFile(upload_dir(), current_app.config.get('UPLOAD_MAX_BYTES'))
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            spool.write(chunk)
+        stream = spool
+
+    stream.flush()
+    os.fsync(stream.fileno())
+    digest = stream.hexdigest()
+    target = blob_path(digest)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(stream.path, target)
+    stream.close()
+
+    filename = secure_filename(file_storage.filename or '') or 'file'
+    return f'/uploads/{digest}/{filename}'
+
+
+def resolve_upload(file_url):
+    """``(relative_path, absolute_path, filename)`` for a stored upload URL, or None"""
+    parts = (file_url or '').split('/')
+    if len(parts) != 4 or parts[1] != 'uploads':
+        return None
+    digest, filename = parts[2], parts[3]
+    if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+        return None
+    path = blob_path(digest)
+    if not os.path.isfile(path):
+        return None
+    return f'{digest[:2]}/{digest}', path, filename
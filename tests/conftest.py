@@ -0,0 +1,75 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from config import TestingConfig
+from app import create_app, db
+from app.models import User, Course, Module, Assessment, Enrollment, Result
+
+PASSWORD = 'password123'
+STUDENTS = 12  # more rows than SQL_NPLUSONE_THRESHOLD, so a per-row query raises
+PASSWORD_HASH = generate_password_hash(PASSWORD)  # hashed once; it is deliberately slow
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        WTF_CSRF_ENABLED = False
+        SQL_INSTRUMENTATION_HEADERS = True
+        DATABASE_SELF_CHECK = False
+        IDENTITY_GENERATION_FILE = str(tmp_path / 'identity.generation')
+        MEDIA_ROOT = str(tmp_path / 'media')
+        UPLOAD_DIR = str(tmp_path / 'uploads')
+        DOCUMENT_EXPORT_DIR = str(tmp_path / 'exports')
+
+    app = create_app(Config)
+    with app.app_context():
+        seed()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def seed():
+    """Two courses, each with modules, assessments and a roster of results"""
+    def user(username, role):
+        u = User(username=username, email=f'{username}@example.com',
+                 full_name=username.title(), role=role, password_hash=PASSWORD_HASH)
+        db.session.add(u)
+        return u
+
+    user('admin', 'admin')
+    instructor = user('ustadz', 'instructor')
+    students = [user(f'santri{n}', 'student') for n in range(1, STUDENTS + 1)]
+    db.session.flush()
+
+    for number in (1, 2):
+        course = Course(title=f'Kursus {number}', description='Deskripsi', instructor_id=instructor.id,
+                        category='Keagamaan', level='beginner', status='published')
+        db.session.add(course)
+        db.session.flush()
+        for order in (1, 2, 3):
+            module = Module(course_id=course.id, title=f'Materi {order}', content=f'<p>Isi materi {order}</p>',
+                            status='published', order=order)
+            db.session.add(module)
+            db.session.flush()
+            assessment = Assessment(module_id=module.id, course_id=course.id, title=f'Tugas {order}',
+                                    assessment_type='assignment', status='published')
+            db.session.add(assessment)
+            db.session.flush()
+            for student in students:
+                db.session.add(Result(user_id=student.id, assessment_id=assessment.id,
+                                      submission_text='Jawaban', status='submitted'))
+        for student in students:
+            db.session.add(Enrollment(user_id=student.id, course_id=course.id))
+    db.session.commit()
+
+
+@pytest.fixture
+def login(app):
+    def login(username):
+        client = app.test_client()
+        response = client.post('/auth/login', data={'username': username, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+    return login
@@ -0,0 +1,24 @@
+from app import db
+from app.models import User
+from app.services.fragments import get_fragment_cache
+from app.services.stats import ADMIN_STATS_KEY, get_admin_stats
+
+
+def test_snapshot_is_dropped_on_commit_not_on_flush(app):
+    with app.app_context():
+        assert get_admin_stats()['total_students'] == 12
+
+        db.session.add(User(username='santri13', email='santri13@example.com', full_name='Santri13',
+                            role='student', password_hash='x'))
+        db.session.flush()
+        # Not committed yet: the cached snapshot still stands
+        assert get_fragment_cache().get(ADMIN_STATS_KEY) is not None
+        db.session.rollback()
+        assert get_admin_stats()['total_students'] == 12
+
+        db.session.add(User(username='santri13', email='santri13@example.com', full_name='Santri13',
+                            role='student', password_hash='x'))
+        db.session.commit()
+        assert get_fragment_cache().get(ADMIN_STATS_KEY) is None
+        assert get_admin_stats()['total_students'] == 13
+
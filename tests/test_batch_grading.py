@@ -0,0 +1,44 @@
+"""POST /instructor/review/batch"""
+from app import db
+from app.models import CourseProgress, Result
+
+
+def test_template_applies_to_filtered_submissions(app, login):
+    client = login('ustadz')
+    response = client.post('/instructor/review/batch', json={'template': {'score': 80}, 'filter': {'assessment_id': 1}})
+    assert response.status_code == 200
+    assert response.json['graded'] == 12
+    # Progress is recounted once for the batch, not per result
+    assert int(response.headers['X-DB-Queries']) <= 12
+
+    with app.app_context():
+        graded = Result.query.filter_by(assessment_id=1, status='graded').all()
+        assert len(graded) == 12
+        assert {r.percentage for r in graded} == {80.0}
+        assert Result.query.filter_by(assessment_id=2, status='graded').count() == 0
+        assert {p.graded_assessments for p in CourseProgress.query.filter_by(course_id=1)} == {1}
+
+
+def test_bad_row_rejects_the_whole_batch(app, login):
+    client = login('ustadz')
+    response = client.post('/instructor/review/batch', json={
+        'grades': [{'result_id': 1, 'score': 50}, {'result_id': 2, 'score': 500}]
+    })
+    assert response.status_code == 400
+    assert response.json['graded'] == 0
+    with app.app_context():
+        assert Result.query.filter_by(status='graded').count() == 0
+
+
+def test_filtered_request_without_filter_is_rejected(app, login):
+    client = login('ustadz')
+    response = client.post('/instructor/review/batch', json={'template': {'score': 80}, 'filter': {'course_id': None}})
+    assert response.status_code == 400
+
+
+def test_form_errors_redirect_to_the_batch_page_not_the_referrer(app, login):
+    client = login('ustadz')
+    response = client.post('/instructor/review/batch', data={'apply_to': 'filtered', 'template_score': '80'},
+                           headers={'Referer': 'https://evil.example/phish'})
+    assert response.status_code == 302
+    assert response.headers['Location'].startswith('/instructor/review/batch')
@@ -0,0 +1,26 @@
+"""Cached course header fragment and the course page's ETag"""
+from datetime import datetime
+
+from app import db
+from app.models import User
+
+
+def test_instructor_rename_refreshes_cached_header(app, login):
+    with app.app_context():
+        db.session.execute(User.__table__.update().where(User.username == 'ustadz')
+                           .values(created_at=datetime(2020, 1, 1), updated_at=None))
+        db.session.commit()
+
+    client = login('santri1')
+    first = client.get('/student/course/1')
+    assert b'Ustadz' in first.data
+    assert client.get('/student/course/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    with app.app_context():
+        User.query.filter_by(username='ustadz').one().full_name = 'Ustadz Abdullah'
+        db.session.commit()
+
+    second = client.get('/student/course/1', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert b'Ustadz Abdullah' in second.data
+    assert second.headers['ETag'] != first.headers['ETag']
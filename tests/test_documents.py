@@ -0,0 +1,20 @@
+import zipfile
+
+from app import db
+from app.models import User
+from app.services.documents import archive_path, build_archive
+
+
+def test_students_whose_usernames_reduce_to_the_same_slug_get_separate_files(app):
+    app.config['DOCUMENT_WORKERS'] = 1
+    with app.app_context():
+        # Both reduce to an empty ASCII slug
+        db.session.get(User, 3).username = 'محمد'
+        db.session.get(User, 4).username = 'أحمد'
+        db.session.commit()
+
+        assert build_archive(1, 1, 'report') == 12
+        with zipfile.ZipFile(archive_path(1)) as archive:
+            names = archive.namelist()
+    assert len(set(names)) == 12
+    assert '3-report.docx' in names and '4-report.docx' in names
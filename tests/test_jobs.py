@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.jobs import Worker, enqueue, job
+from app.models import Job
+
+attempts = []
+
+
+@job('test.flaky')
+def flaky_job(job):
+    attempts.append(job.attempts)
+    if job.attempts < job.args['succeed_on']:
+        raise RuntimeError(f'attempt {job.attempts} failed')
+    return {'attempt': job.attempts}
+
+
+@pytest.fixture
+def queue(app):
+    # Retries become due at once, so one burst run sees every attempt
+    app.config['JOB_RETRY_BACKOFF'] = 0
+    attempts.clear()
+
+    def add(succeed_on, **values):
+        with app.app_context():
+            queued = enqueue('test.flaky', {'succeed_on': succeed_on})
+            for name, value in values.items():
+                setattr(queued, name, value)
+            db.session.commit()
+            return queued.id
+    return add
+
+
+def _job(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id).to_dict()
+
+
+def test_failed_attempts_are_retried_until_the_handler_succeeds(app, queue):
+    job_id = queue(succeed_on=3)
+    Worker(app, name='w1').work(burst=True)
+
+    assert attempts == [1, 2, 3]
+    job = _job(app, job_id)
+    assert job['status'] == 'done'
+    assert job['result'] == {'attempt': 3}
+    assert job['error'] is None
+
+
+def test_job_fails_after_max_attempts(app, queue):
+    job_id = queue(succeed_on=99)
+    Worker(app, name='w1').work(burst=True)
+
+    assert attempts == [1, 2, 3]
+    job = _job(app, job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'attempt 3 failed'
+
+
+def test_expired_lease_is_claimed_again(app, queue):
+    past = datetime.utcnow() - timedelta(seconds=1)
+    # A worker died holding this one; its lease has run out
+    orphan = queue(succeed_on=1, status='running', attempts=1, locked_by='dead', available_at=past)
+    # Still leased to a live worker: left alone
+    leased = queue(succeed_on=1, status='running', attempts=1, locked_by='busy',
+                   available_at=datetime.utcnow() + timedelta(minutes=5))
+    Worker(app, name='w1').work(burst=True)
+
+    assert attempts == [2]
+    assert _job(app, orphan)['status'] == 'done'
+    assert _job(app, leased)['status'] == 'running'
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(app, queue):
+    past = datetime.utcnow() - timedelta(seconds=1)
+    job_id = queue(succeed_on=1, status='running', attempts=3, locked_by='dead', available_at=past)
+    Worker(app, name='w1').work(burst=True)
+
+    assert attempts == []
+    job = _job(app, job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Melebihi batas waktu pengerjaan.'
+
+
+def test_worker_that_lost_its_lease_cannot_finish_the_job(app, queue):
+    job_id = queue(succeed_on=1, status='running', attempts=1, locked_by='w2')
+    with app.app_context():
+        Worker(app, name='w1')._finish(job_id, status='done')
+    assert _job(app, job_id)['status'] == 'running'
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+NAME = 'doa sebelum belajar ṣalāh?.mp3'
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def audio(app):
+    directory = os.path.join(app.config['MEDIA_ROOT'], 'audio')
+    os.makedirs(directory)
+    with open(os.path.join(directory, NAME), 'wb') as f:
+        f.write(DATA)
+    return '/media/audio/' + NAME.replace('?', '%3F')
+
+
+def test_range_request_returns_only_those_bytes(login, audio):
+    client = login('santri1')
+    response = client.get(audio, headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(DATA)}'
+    assert response.data == DATA[10:20]
+
+    response = client.get(audio, headers={'Range': f'bytes={len(DATA)}-'})
+    assert response.status_code == 416
+
+
+def test_if_range_with_an_old_etag_sends_the_whole_file(login, audio):
+    client = login('santri1')
+    etag = client.get(audio).headers['ETag']
+    assert client.get(audio, headers={'If-None-Match': etag}).status_code == 304
+
+    response = client.get(audio, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == DATA
+
+
+def test_x_accel_redirect_path_is_url_quoted(app, login, audio):
+    app.config['MEDIA_X_ACCEL_PREFIX'] = '/protected-media/'
+    response = login('santri1').get(audio)
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == (
+        '/protected-media/audio/doa%20sebelum%20belajar%20%E1%B9%A3al%C4%81h%3F.mp3'
+    )
@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+from app import metrics
+from app.instrumentation import SQLStats
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _snapshot(pid, count, written_at=None):
+    stats = {'buckets': [count] + [0] * len(metrics.LATENCY_BUCKETS), 'count': count, 'sum': 0.1 * count,
+             'db_time': 0.0, 'db_queries': 2 * count, 'status': {'2xx': count}}
+    return {'id': f'{pid}-test', 'pid': pid, 'written_at': written_at or metrics.time.time(), 'started_at': 0,
+            'in_flight': 1, 'endpoints': {'student.catalog': stats}, 'slow_queries': []}
+
+
+def _count(merged):
+    return merged['endpoints'].get('student.catalog', {}).get('count', 0)
+
+
+def test_exited_worker_counters_stay_after_its_snapshot_is_removed(tmp_path):
+    own = _count(metrics.collect())
+    metrics.write_snapshot(str(tmp_path), _snapshot(_dead_pid(), 5))
+
+    first = metrics.collect(str(tmp_path), max_age=60)
+    assert _count(first) == own + 5
+    assert first['in_flight'] == metrics.registry.in_flight  # gauges only from live workers
+    assert not list(tmp_path.glob('worker-*.json'))
+
+    # A second scrape reads the retired totals instead of counting them again
+    assert _count(metrics.collect(str(tmp_path), max_age=60)) == own + 5
+    assert json.loads((tmp_path / metrics.RETIRED_SNAPSHOT).read_text())['endpoints']['student.catalog']['count'] == 5
+
+
+def test_snapshot_left_behind_after_folding_is_not_counted_twice(tmp_path):
+    own = _count(metrics.collect())
+    pid = _dead_pid()
+    metrics.write_snapshot(str(tmp_path), _snapshot(pid, 3))
+    metrics.collect(str(tmp_path), max_age=60)
+    # As if the worker's file survived a crash between folding and deleting it
+    metrics.write_snapshot(str(tmp_path), _snapshot(pid, 3))
+    assert _count(metrics.collect(str(tmp_path), max_age=60)) == own + 3
+
+
+def test_metrics_alone_do_not_fingerprint_statements():
+    stats = SQLStats(fingerprints=False)
+    for n in range(20):
+        stats.record(f'SELECT * FROM users WHERE id = {n}', 0.001)
+    assert stats.count == 20
+    assert stats.repeated(10) == []
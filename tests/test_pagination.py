@@ -0,0 +1,54 @@
+import re
+from datetime import datetime
+from html import unescape
+
+from app import db
+from app.models import Course, Result
+
+
+def _pages(client, url, link):
+    """Follow the "next" links from ``url``; yields each page's HTML"""
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        yield html
+        match = re.search(rf'href="({re.escape(link)}[^"]*after=[^"]+)"', html)
+        url = unescape(match.group(1)) if match else None
+
+
+def test_catalog_pages_by_course_id(app, login):
+    app.config['CATALOG_PAGE_SIZE'] = 2
+    with app.app_context():
+        for number, status in ((3, 'published'), (4, 'draft')):
+            db.session.add(Course(title=f'Kursus {number}', instructor_id=2, level='beginner', status=status))
+        db.session.commit()
+
+    pages = [sorted({int(i) for i in re.findall(r'/student/(?:course|catalog)/(\d+)', html)}, reverse=True)
+             for html in _pages(login('santri1'), '/student/catalog', '/student/catalog')]
+    assert pages == [[3, 2], [1]]
+
+
+def test_review_queue_cursor_breaks_submitted_at_ties_by_id(app, login):
+    app.config['REVIEW_PAGE_SIZE'] = 10
+    with app.app_context():
+        # Every submission at the same instant: only the id orders them
+        Result.query.update({Result.submitted_at: datetime(2024, 1, 1, 8, 0)})
+        db.session.commit()
+        expected = [id for (id,) in db.session.query(Result.id).order_by(Result.id)]
+
+    seen = []
+    for html in _pages(login('ustadz'), '/instructor/assessment/review', '/instructor/assessment/review'):
+        seen += [int(i) for i in re.findall(r'/instructor/review/submit/(\d+)"', html)]
+    assert seen == expected
+
+
+def test_invalid_cursor_restarts_the_review_queue(login):
+    client = login('ustadz')
+
+    def submission_ids(url):
+        return re.findall(r'/instructor/review/submit/(\d+)"', client.get(url).get_data(as_text=True))
+
+    first = submission_ids('/instructor/assessment/review')
+    assert first
+    assert submission_ids('/instructor/assessment/review?after=bogus') == first
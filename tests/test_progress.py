@@ -0,0 +1,114 @@
+"""course_progress and enrollment percentages follow grading and content changes"""
+from app import db
+from app.models import Assessment, CourseProgress, Enrollment, Result, User
+from app.services.grading import grade_result
+
+
+def _student(name='santri1'):
+    return User.query.filter_by(username=name).one()
+
+
+def _progress(user_id, course_id=1):
+    return db.session.get(CourseProgress, (user_id, course_id))
+
+
+def _enrollment(user_id, course_id=1):
+    return Enrollment.query.filter_by(user_id=user_id, course_id=course_id).one()
+
+
+def _grade_all(user_id, course_id=1):
+    for result in Result.query.join(Assessment).filter(Result.user_id == user_id,
+                                                       Assessment.course_id == course_id):
+        grade_result(result, 90.0, '', 100.0)
+    db.session.commit()
+
+
+def test_batch_grading_two_attempts_counts_assessment_once(app, login):
+    with app.app_context():
+        student = _student()
+        first = Result.query.filter_by(user_id=student.id, assessment_id=1).one()
+        second = Result(user_id=student.id, assessment_id=1, attempt_number=2,
+                        submission_text='Jawaban', status='submitted')
+        db.session.add(second)
+        db.session.commit()
+        ids, user_id = [first.id, second.id], student.id
+
+    client = login('ustadz')
+    response = client.post('/instructor/review/batch', json={
+        'grades': [{'result_id': ids[0], 'score': 70}, {'result_id': ids[1], 'score': 90}]
+    })
+    assert response.status_code == 200
+    assert response.json['graded'] == 2
+
+    with app.app_context():
+        progress = _progress(user_id)
+        assert progress.graded_assessments == 1
+        assert progress.completed_assessments == 3
+        assert round(_enrollment(user_id).progress_percentage, 2) == 33.33
+
+
+def test_draft_content_is_not_counted_until_published(app):
+    with app.app_context():
+        user_id = _student().id
+        draft = Assessment(module_id=1, course_id=1, title='Draf', assessment_type='assignment', status='draft')
+        db.session.add(draft)
+        db.session.commit()
+        assert _progress(user_id).total_assessments == 3
+
+        draft.status = 'published'
+        db.session.commit()
+        assert _progress(user_id).total_assessments == 4
+
+
+def test_completion_reopens_when_an_assessment_is_published(app):
+    with app.app_context():
+        user_id = _student().id
+        _grade_all(user_id)
+        enrollment = _enrollment(user_id)
+        assert enrollment.progress_percentage == 100
+        assert enrollment.status == 'completed'
+
+        db.session.add(Assessment(module_id=1, course_id=1, title='Baru', assessment_type='assignment',
+                                  status='published'))
+        db.session.commit()
+        enrollment = _enrollment(user_id)
+        assert enrollment.progress_percentage == 75
+        assert enrollment.status == 'active'
+        assert enrollment.completed_at is None
+
+
+def test_dropped_enrollment_is_never_completed(app):
+    with app.app_context():
+        user_id = _student().id
+        _enrollment(user_id).status = 'dropped'
+        db.session.commit()
+        _grade_all(user_id)
+        enrollment = _enrollment(user_id)
+        assert enrollment.progress_percentage == 100
+        assert enrollment.status == 'dropped'
+
+
+def test_withdrawn_grade_and_deleted_result_are_recounted(app):
+    with app.app_context():
+        user_id = _student().id
+        result = Result.query.filter_by(user_id=user_id, assessment_id=1).one()
+        grade_result(result, 80.0, '', 100.0)
+        db.session.commit()
+        assert _progress(user_id).graded_assessments == 1
+
+        result.status = 'submitted'
+        db.session.commit()
+        assert _progress(user_id).graded_assessments == 0
+
+        db.session.delete(result)
+        db.session.commit()
+        assert _progress(user_id).completed_assessments == 2
+        assert _enrollment(user_id).progress_percentage == 0
+
+
+def test_create_all_backfills_a_new_progress_table(app):
+    with app.app_context():
+        CourseProgress.__table__.drop(db.engine)
+        db.create_all()
+        assert CourseProgress.query.count() == 24
+        assert _progress(_student().id).completed_assessments == 3
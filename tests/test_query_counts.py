@@ -0,0 +1,44 @@
+"""Query budgets per view, counted by the request's SQLStats (X-DB-Queries).
+
+The fixture holds more rows per list than SQL_NPLUSONE_THRESHOLD, so a view
+that queries per row fails with NPlusOneError before the budget is checked;
+the budget catches a view growing extra constant queries.
+"""
+import pytest
+
+VIEWS = [
+    # (user, url, query budget)
+    ('admin', '/admin/dashboard', 3),
+    ('admin', '/admin/manage/users', 3),
+    ('admin', '/admin/manage/courses', 3),
+    ('admin', '/admin/user/3/edit', 2),
+    ('admin', '/admin/course/1/edit', 3),
+    ('admin', '/admin/enrollments/import', 2),
+    ('admin', '/admin/users/import', 1),
+    ('admin', '/admin/metrics', 1),
+    ('ustadz', '/instructor/dashboard', 3),
+    ('ustadz', '/instructor/course/create', 1),
+    ('ustadz', '/instructor/course/1/manage', 4),
+    ('ustadz', '/instructor/course/1/gradebook.xlsx', 4),
+    ('ustadz', '/instructor/module/create/1', 2),
+    ('ustadz', '/instructor/assessment/create/1', 2),
+    ('ustadz', '/instructor/assessment/review', 3),
+    ('ustadz', '/instructor/review/submit/1', 2),
+    ('ustadz', '/instructor/review/batch', 3),
+    ('santri1', '/student/dashboard', 3),
+    ('santri1', '/student/catalog', 4),
+    ('santri1', '/student/course/1', 5),
+    ('santri1', '/student/module/1', 5),
+    ('santri1', '/student/assessment/1', 4),
+    ('santri1', '/student/progress', 2),
+    ('santri1', '/student/search?q=materi', 3),
+]
+
+
+@pytest.mark.parametrize('username,url,budget', VIEWS)
+def test_query_budget(login, username, url, budget):
+    client = login(username)
+    response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    queries = int(response.headers['X-DB-Queries'])
+    assert queries <= budget, f'{url} ran {queries} queries (budget {budget})'
@@ -0,0 +1,57 @@
+import hashlib
+import io
+import os
+
+from app import db
+from app.models import Assessment, Result
+
+DATA = b'%PDF-1.4 jawaban tugas\n' * 1000
+
+
+def _submit(client, data, filename='tugas.pdf'):
+    return client.post('/student/assessment/1', data={
+        'submission_text': '', 'submission_file': (io.BytesIO(data), filename)
+    }, content_type='multipart/form-data')
+
+
+def _stored_files(app):
+    return sorted(os.path.relpath(os.path.join(root, name), app.config['UPLOAD_DIR'])
+                  for root, _, names in os.walk(app.config['UPLOAD_DIR']) for name in names)
+
+
+def test_identical_uploads_are_hashed_and_stored_once(app, login):
+    with app.app_context():
+        db.session.get(Assessment, 1).allow_multiple_attempts = True
+        db.session.commit()
+
+    for username in ('santri1', 'santri2'):
+        assert _submit(login(username), DATA).status_code == 302
+
+    digest = hashlib.sha256(DATA).hexdigest()
+    # One blob, no spool files left behind
+    assert _stored_files(app) == [os.path.join(digest[:2], digest)]
+    with app.app_context():
+        urls = {url for (url,) in db.session.query(Result.submission_file_url).filter(
+            Result.submission_file_url.isnot(None))}
+        result_id = db.session.query(Result.id).filter(Result.submission_file_url.isnot(None)).first()[0]
+    assert urls == {f'/uploads/{digest}/tugas.pdf'}
+
+    response = login('ustadz').get(f'/instructor/review/submit/{result_id}/file')
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert 'attachment' in response.headers['Content-Disposition']
+
+
+def test_oversized_upload_is_rejected_without_leaving_a_spool(app, login):
+    with app.app_context():
+        db.session.get(Assessment, 1).allow_multiple_attempts = True
+        db.session.commit()
+    app.config['UPLOAD_MAX_BYTES'] = 1024
+
+    client = login('santri1')
+    response = _submit(client, DATA)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/student/assessment/1')
+    assert _stored_files(app) == []
+    with app.app_context():
+        assert Result.query.filter(Result.submission_file_url.isnot(None)).count() == 0